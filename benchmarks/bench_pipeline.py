@@ -0,0 +1,240 @@
+"""端到端延遲基準測試
+
+啟動本機模擬伺服器（fake_openai_server），從 generate_keywords 到 generate_full_literature_review
+完整執行整個流程數次，並回報各步驟的 p50/p95 延遲。可與先前儲存的結果比較以偵測效能退化。
+
+使用方式：
+    python benchmarks/bench_pipeline.py --iterations 20
+    python benchmarks/bench_pipeline.py --json bench_result.json
+    python benchmarks/bench_pipeline.py --baseline bench_result.json --max-regression 1.25
+    python benchmarks/bench_pipeline.py --connect-latency 0.1 --client per-module
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_openai_server import FakeServerConfig, start_server
+
+TOPIC = "探討設計思考如何應用於提升數位介面的使用者經驗"
+CONTENT = "本研究以參與式設計工作坊與使用性測試，分析設計思考流程對介面設計成效的影響"
+LITERATURE = """Brown, T. (2009). Change by design. Harper Business.
+本書說明設計思考的核心流程與組織應用。
+
+Sanders, E. B.-N., & Stappers, P. J. (2008). Co-creation and the new landscapes of design. CoDesign, 4(1), 5-18.
+探討共同創造與參與式設計在設計研究中的角色。
+
+Norman, D. A. (2013). The design of everyday things. Basic Books.
+提出以使用者為中心的設計原則與可用性觀點。"""
+
+
+class NullContainer:
+    """串流模式下用來取代 st.empty() 的容器，只接收內容不做渲染"""
+
+    def markdown(self, text):
+        pass
+
+    def empty(self):
+        pass
+
+
+def use_client_setup(setup):
+    """切換 OpenAI 客戶端的配置，用於比較共用連線池與其他做法
+
+    shared：兩個頁面共用 openai_client 建立的連線池（目前的做法）
+    per-module：各頁面各自建立預設的 OpenAI 客戶端（改版前的做法）
+    no-keepalive：不保留閒置連線，每個請求都重新建立連線
+    """
+    from openai import DefaultHttpxClient, OpenAI
+    import httpx
+    import literature_engine
+    import research_engine
+
+    if setup == 'shared':
+        return
+    if setup == 'per-module':
+        research_engine.client = OpenAI()
+        literature_engine.client = OpenAI()
+    elif setup == 'no-keepalive':
+        client = OpenAI(http_client=DefaultHttpxClient(limits=httpx.Limits(max_keepalive_connections=0)))
+        research_engine.client = client
+        literature_engine.client = client
+
+
+def percentile(values, pct):
+    """以最近排名法計算百分位數"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_pipeline(research_engine, literature_engine, stream, contexts=None):
+    """執行一次完整流程，回傳各步驟耗時（秒）；提供 contexts 列表時加入文獻探討步驟的文獻打包報告"""
+    timings = {}
+
+    def timed(name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[name] = time.perf_counter() - start
+        if not result or result == (None, None):
+            raise RuntimeError(f"步驟 {name} 沒有產生結果")
+        return result
+
+    container = NullContainer() if stream else None
+
+    keywords = timed('generate_keywords', research_engine.request_keywords, TOPIC, CONTENT)
+    timed(
+        'generate_search_query', research_engine.request_search_query,
+        research_engine.normalize_keywords(keywords[:5])
+    )
+    timed('generate_titles', research_engine.request_titles, TOPIC, CONTENT, LITERATURE)
+    selected_title = {'type': '1. 理論導向：', 'title': keywords[0], 'description': ''}
+    purpose, references = timed(
+        'generate_full_content', research_engine.request_full_content,
+        TOPIC, CONTENT, LITERATURE, selected_title, container
+    )
+    structure = timed('analyze_research_purpose', literature_engine.request_research_structure, purpose)
+    section_title = structure['sections'][0]['title_zh']
+    literature = timed(
+        'analyze_multiple_literature', literature_engine.request_multiple_literature,
+        section_title, LITERATURE
+    )['literature']
+    review = timed(
+        'generate_literature_review', literature_engine.request_literature_review,
+        section_title, literature, stream_container=container, section=structure['sections'][0]
+    )
+    sections = timed(
+        'generate_literature_review_sections', research_engine.request_literature_review_sections,
+        selected_title, purpose, references
+    )
+    collected_literature = {
+        f"literature_{section['order']}": [
+            {'citation': item['citation'], 'summary': item['abstract']} for item in literature
+        ]
+        for section in sections
+    }
+    full_review = timed(
+        'generate_full_literature_review', research_engine.request_full_literature_review,
+        selected_title, purpose, sections, collected_literature, stream_container=container
+    )
+    if contexts is not None:
+        contexts.extend([review['context'], full_review['context']])
+    return timings
+
+
+def summarize(samples):
+    """彙整各步驟的 p50/p95 與平均值"""
+    summary = {}
+    for name in samples[0]:
+        values = [sample[name] for sample in samples]
+        summary[name] = {
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'mean': sum(values) / len(values)
+        }
+    totals = [sum(sample.values()) for sample in samples]
+    summary['total'] = {
+        'p50': percentile(totals, 50),
+        'p95': percentile(totals, 95),
+        'mean': sum(totals) / len(totals)
+    }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'step':<40}{'p50 (ms)':>12}{'p95 (ms)':>12}{'mean (ms)':>12}")
+    for name, stats in summary.items():
+        print(f"{name:<40}{stats['p50'] * 1000:>12.1f}{stats['p95'] * 1000:>12.1f}{stats['mean'] * 1000:>12.1f}")
+
+
+def compare_with_baseline(summary, baseline, max_regression):
+    """與基準結果比較 p95，回傳退化超過門檻的步驟"""
+    regressions = []
+    for name, stats in summary.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['p95']
+        if before > 0 and stats['p95'] > before * max_regression:
+            regressions.append((name, before, stats['p95']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='對本機模擬伺服器執行完整流程的延遲基準測試')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1, help='不列入統計的暖身次數')
+    parser.add_argument('--latency', type=float, default=0.05, help='模擬伺服器的固定延遲（秒）')
+    parser.add_argument('--connect-latency', type=float, default=0.0, help='模擬每個新連線的交握延遲（秒）')
+    parser.add_argument('--client', choices=['shared', 'per-module', 'no-keepalive'], default='shared',
+                        help='OpenAI 客戶端配置，用於比較連線池的效益')
+    parser.add_argument('--tokens-per-second', type=float, default=2000.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--invalid-item-rate', type=float, default=0.0, help='JSON 回應中每個項目缺少欄位的機率')
+    parser.add_argument('--stream', action='store_true', help='長篇內容使用串流模式')
+    parser.add_argument('--cache', action='store_true', help='啟用 LLM 回應快取（預設關閉以測量實際呼叫）')
+    parser.add_argument('--json', dest='json_path', help='將統計結果寫入 JSON 檔案')
+    parser.add_argument('--baseline', help='先前儲存的 JSON 結果，用於偵測效能退化')
+    parser.add_argument('--max-regression', type=float, default=1.25, help='p95 允許的最大倍數')
+    args = parser.parse_args()
+
+    server, base_url = start_server(FakeServerConfig(
+        latency=args.latency,
+        connect_latency=args.connect_latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        invalid_item_rate=args.invalid_item_rate,
+        seed=0
+    ))
+
+    # 須在匯入應用程式模組前設定，讓 OpenAI 客戶端連到模擬伺服器
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ['OPENAI_API_KEY'] = 'fake-key'
+    os.environ['LLM_CACHE_ENABLED'] = 'true' if args.cache else 'false'
+    os.environ.setdefault('LLM_CACHE_PATH', '')
+
+    import literature_engine
+    import research_engine
+    use_client_setup(args.client)
+
+    for _ in range(args.warmup):
+        run_pipeline(research_engine, literature_engine, args.stream)
+    contexts = []
+    samples = [
+        run_pipeline(research_engine, literature_engine, args.stream, contexts) for _ in range(args.iterations)
+    ]
+    server.shutdown()
+
+    summary = summarize(samples)
+    print_summary(summary)
+    print(f"\n模擬伺服器共處理 {server.request_count} 個請求，新建 {server.connection_count} 個連線")
+    from structured_output import REPAIR_STATS
+    repair = REPAIR_STATS.totals()
+    print(
+        f"結構化輸出：檢查 {repair['items']} 項，無效 {repair['invalid']} 項，"
+        f"修補請求 {repair['repair_calls']} 次，修補成功 {repair['repaired']} 項，仍失敗 {repair['failed']} 項"
+    )
+    from context_packer import format_pack_report, merge_pack_reports
+    print(f"文獻探討提示詞：{format_pack_report(merge_pack_reports(contexts))}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(summary, baseline, args.max_regression)
+        for name, before, after in regressions:
+            print(f"效能退化：{name} p95 {before * 1000:.1f} ms → {after * 1000:.1f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""文獻相關性排序的基準測試
+
+產生指定篇數的中英文摘要（部分與章節主題相關、其餘為無關主題），量測 relevance_ranker 的排序耗時，
+並檢查相關文獻是否排在前面。不呼叫 OpenAI API。
+
+使用方式：
+    python benchmarks/bench_ranking.py --papers 300
+    python benchmarks/bench_ranking.py --papers 1000 --top-k 20 --repeat 20
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+
+from relevance_ranker import rank_papers
+
+SECTION = {
+    'title_zh': '設計思考與使用者經驗',
+    'title_en': 'Design Thinking and User Experience',
+    'description': '探討設計思考的核心流程如何應用於數位介面，並提升使用者經驗',
+    'subtitles': [
+        {'subtitle_zh': '設計思考的理論基礎', 'content_focus': '同理、定義、發想、原型與測試的流程'},
+        {'subtitle_zh': '參與式設計與共同創造', 'content_focus': '使用者參與介面設計的方法'},
+    ],
+    'search_queries': [
+        {'focus': '設計思考流程', 'query': 'How does the design thinking process improve user experience of digital interfaces?'},
+        {'focus': '參與式設計', 'query': 'Participatory design and co-creation methods in interface design'},
+    ],
+}
+RELEVANT_ZH = '設計思考的同理與原型測試流程能提升數位介面的使用者經驗，參與式設計讓使用者共同創造介面。'
+OTHER_ZH = '本研究分析土壤化學性質與農業產量的關係，並探討氣候變遷對作物生長與灌溉管理的影響。'
+RELEVANT_EN = 'design thinking prototyping and participatory design improve the user experience of digital interfaces'
+OTHER_EN = 'soil chemistry crop yield irrigation management and climate change effects on agriculture'
+FILLER_EN = 'the results of this study show that the proposed approach is effective in practice'.split()
+
+
+def make_papers(count, relevant_ratio, rng):
+    papers = []
+    for index in range(count):
+        relevant = rng.random() < relevant_ratio
+        if index % 2:
+            abstract = ''.join(rng.sample(RELEVANT_ZH if relevant else OTHER_ZH, 30)) * 12
+        else:
+            words = (RELEVANT_EN if relevant else OTHER_EN).split() * 6 + FILLER_EN * 6
+            rng.shuffle(words)
+            abstract = ' '.join(words)
+        papers.append({
+            'citation': f"Author{index}, A. ({2000 + index % 25}). Study {index}. Journal, 1(1), 1-10.",
+            'abstract': abstract,
+            'relevant': relevant,
+        })
+    return papers
+
+
+def percentile(values, pct):
+    """以最近排名法計算百分位數"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='量測本機 BM25 文獻排序的耗時與排序品質')
+    parser.add_argument('--papers', type=int, default=300, help='文獻篇數')
+    parser.add_argument('--relevant-ratio', type=float, default=0.2, help='與章節相關的文獻比例')
+    parser.add_argument('--top-k', type=int, default=20, help='計算前幾篇的精確率')
+    parser.add_argument('--repeat', type=int, default=10, help='量測次數')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    papers = make_papers(args.papers, args.relevant_ratio, random.Random(args.seed))
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        order, _ = rank_papers(SECTION, papers)
+        timings.append(time.perf_counter() - started)
+
+    top = order[:args.top_k]
+    relevant_total = sum(paper['relevant'] for paper in papers)
+    precision = sum(papers[index]['relevant'] for index in top) / max(1, len(top))
+    characters = sum(len(paper['citation']) + len(paper['abstract']) for paper in papers)
+    print(f"{args.papers} 篇文獻（{characters / 1000:.0f}k 字元，相關 {relevant_total} 篇）")
+    print(f"排序耗時 p50 {percentile(timings, 50) * 1000:.1f} ms，p95 {percentile(timings, 95) * 1000:.1f} ms")
+    print(f"前 {len(top)} 篇的精確率 {precision:.0%}")
+
+
+if __name__ == '__main__':
+    main()
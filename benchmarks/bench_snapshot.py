@@ -0,0 +1,137 @@
+"""session 快照的基準測試
+
+模擬一個逐步累積文獻的 session：每一步在某個章節新增一篇文獻（並不時更新文獻探討），
+比較兩種保存方式每一步的耗時與寫入量：
+- 區塊快照：session_snapshot.SnapshotTracker 只寫入有變更的區塊
+- 完整快照：每一步把整個 session state 序列化、壓縮後整份寫入
+最後從資料庫還原並確認內容一致。不呼叫 OpenAI API。
+
+使用方式：
+    python benchmarks/bench_snapshot.py --steps 500
+    python benchmarks/bench_snapshot.py --steps 1000 --sections 8 --json snapshot_result.json
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+
+from session_snapshot import SNAPSHOT_COMPRESSION_LEVEL, SnapshotTracker, encode_chunk
+from session_store import SessionStore
+
+ABSTRACT = "本研究探討設計思考在數位介面開發流程中的應用，透過參與式工作坊與使用性測試分析其對使用者經驗的影響。" * 4
+
+
+def percentile(values, pct):
+    """以最近排名法計算百分位數"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def make_paper(index):
+    return {
+        'citation': f"Author{index}, A. ({2000 + index % 25}). Study number {index} on design thinking. Journal of Design, {index % 40}(2), 1-20.",
+        'summary': f"{ABSTRACT}（第 {index} 篇）",
+        'relevance': '與本章節的研究問題高度相關',
+        'contribution': '提供設計思考應用於介面設計的實證資料',
+    }
+
+
+def grow_session(state, step, sections):
+    """模擬一次頁面操作：新增一篇文獻，每 10 步更新一個章節的文獻探討"""
+    section = f"第 {step % sections + 1} 節"
+    papers = state['collected_literature'].setdefault(section, [])
+    papers.append(make_paper(step))
+    if step % 10 == 9:
+        state['literature_reviews'][section] = {
+            'content': f"{ABSTRACT * 3}（更新於第 {step} 步）",
+            'references': [paper['citation'] for paper in papers],
+        }
+
+
+def save_blocks(store, tracker, state):
+    started = time.perf_counter()
+    changed, removed, records = tracker.diff(state)
+    if changed or removed:
+        store.write_snapshot('blocks', changed, removed)
+    tracker.commit(records)
+    return time.perf_counter() - started, sum(len(path) + len(data) for path, data in changed)
+
+
+def save_full(store, state):
+    started = time.perf_counter()
+    data = zlib.compress(encode_chunk(state), SNAPSHOT_COMPRESSION_LEVEL)
+    store.write_snapshot('full', [('[]', data)])
+    return time.perf_counter() - started, len(data)
+
+
+def summarize(samples):
+    """回傳整體與最後 10% 步驟的 p50/p95，用來觀察 session 變大後的趨勢"""
+    tail = samples[-max(1, len(samples) // 10):]
+    return {
+        'p50': percentile(samples, 50), 'p95': percentile(samples, 95),
+        'last_p50': percentile(tail, 50), 'last_p95': percentile(tail, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比較區塊快照與完整快照的耗時與寫入量')
+    parser.add_argument('--steps', type=int, default=500, help='模擬的頁面操作次數（每次新增一篇文獻）')
+    parser.add_argument('--sections', type=int, default=6, help='文獻探討的章節數')
+    parser.add_argument('--json', dest='json_path', help='將統計結果寫入 JSON 檔案')
+    args = parser.parse_args()
+
+    state = {'step': 5, 'collected_literature': {}, 'literature_reviews': {}}
+    results = {'blocks': {'seconds': [], 'bytes': []}, 'full': {'seconds': [], 'bytes': []}}
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = SessionStore(os.path.join(store_dir, 'session_store.sqlite3'))
+        tracker = SnapshotTracker()
+        for step in range(args.steps):
+            grow_session(state, step, args.sections)
+            for name, (seconds, written) in (
+                ('blocks', save_blocks(store, tracker, state)),
+                ('full', save_full(store, state)),
+            ):
+                results[name]['seconds'].append(seconds)
+                results[name]['bytes'].append(written)
+
+        started = time.perf_counter()
+        restored = SnapshotTracker().restore(store.read_snapshot('blocks'))
+        restore_seconds = time.perf_counter() - started
+        if restored != state:
+            raise RuntimeError('還原的內容與原本的 session state 不一致')
+        stored_bytes = sum(len(data) for _, data in store.read_snapshot('blocks'))
+
+    raw_bytes = len(encode_chunk(state))
+    print(f"{args.steps} 步，{args.sections} 個章節；session state 原始 JSON {raw_bytes / 1024:.1f} KB，"
+          f"區塊快照壓縮後 {stored_bytes / 1024:.1f} KB，還原耗時 {restore_seconds * 1000:.1f} ms\n")
+    print(f"{'method':<10}{'metric':<18}{'p50':>12}{'p95':>12}{'last p50':>12}{'last p95':>12}")
+    summary = {}
+    for name, samples in results.items():
+        summary[name] = {
+            'seconds': summarize(samples['seconds']),
+            'bytes': summarize(samples['bytes']),
+            'total_bytes': sum(samples['bytes']),
+        }
+        timing = summary[name]['seconds']
+        written = summary[name]['bytes']
+        print(f"{name:<10}{'write (ms)':<18}" + ''.join(f"{timing[key] * 1000:>12.2f}" for key in timing))
+        print(f"{name:<10}{'written (bytes)':<18}" + ''.join(f"{written[key]:>12}" for key in written))
+    print(f"\n累計寫入量：區塊快照 {summary['blocks']['total_bytes'] / 1024:.1f} KB，"
+          f"完整快照 {summary['full']['total_bytes'] / 1024:.1f} KB")
+
+    if args.json_path:
+        summary.update(raw_bytes=raw_bytes, stored_bytes=stored_bytes, restore_seconds=restore_seconds)
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""啟動時間與頁面切換的基準測試
+
+每次在新的 Python 程序中以 Streamlit AppTest 執行 streamlit_app.py，量測：
+- 冷啟動：從啟動程序到第一個頁面顯示完成（含直譯器與 Streamlit 本身的載入）
+- 首次執行：streamlit_app.py 第一次執行所需的時間（匯入頁面模組並顯示第一個頁面）
+- 首次切換：在側邊欄第一次切換到另一個頁面（需要匯入該頁面的模組）
+- 重新執行：之後每次切換頁面或重新執行的時間（模組已載入）
+並以 -X importtime 的輸出列出最耗時的匯入。不呼叫 OpenAI API，不需要金鑰。
+
+使用方式：
+    python benchmarks/bench_startup.py --iterations 5
+    python benchmarks/bench_startup.py --top 20 --json startup_result.json
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+PAGES = ["研究目的生成", "文獻分析工具"]
+
+# 在子程序中執行：顯示第一個頁面、切換頁面並重新執行數次，將各階段耗時以 JSON 輸出到 stdout
+PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+started = time.perf_counter()
+at = AppTest.from_file({app_path!r}, default_timeout=60).run()
+result = {{'rendered_at': time.time(), 'first_run': time.perf_counter() - started, 'exception': [str(e) for e in at.exception]}}
+
+def timed_run(page=None):
+    started = time.perf_counter()
+    if page is not None:
+        at.sidebar.radio[0].set_value(page)
+    at.run()
+    return time.perf_counter() - started
+
+result['first_switch'] = timed_run({pages!r}[1])
+result['switch'] = [timed_run({pages!r}[index % 2]) for index in range({reruns})]
+result['rerun'] = {{page: [] for page in {pages!r}}}
+for page in {pages!r}:
+    timed_run(page)
+    result['rerun'][page] = [timed_run() for _ in range({reruns})]
+print(json.dumps(result))
+"""
+
+
+def percentile(values, pct):
+    """以最近排名法計算百分位數"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的輸出，回傳最外層匯入的 [(模組, 累計秒數)]"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # 縮排表示由其他模組間接匯入，只保留最外層
+        if name.startswith(' ') and not name.startswith('  '):
+            imports.append((name.strip(), int(cumulative) / 1e6))
+    return imports
+
+
+def run_probe(reruns, store_dir):
+    """在新程序中執行一次量測，回傳 (量測結果, 匯入耗時列表)"""
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'fake-key'),
+        LLM_CACHE_PATH='',
+        JOB_STORE_PATH=os.path.join(store_dir, 'jobs.sqlite3'),
+        SESSION_STORE_PATH=os.path.join(store_dir, 'session_store.sqlite3'),
+        PYTHONDONTWRITEBYTECODE='',
+    )
+    code = PROBE.format(app_path=os.path.join(ROOT_DIR, 'streamlit_app.py'), pages=PAGES, reruns=reruns)
+    launched_at = time.time()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    if result['exception']:
+        raise RuntimeError(f"頁面執行時發生錯誤：{result['exception']}")
+    result['cold_start'] = result.pop('rendered_at') - launched_at
+    return result, parse_importtime(process.stderr)
+
+
+def summarize(samples):
+    """彙整各項量測的 p50/p95（秒）"""
+    metrics = {
+        'cold_start': [sample['cold_start'] for sample in samples],
+        'first_run': [sample['first_run'] for sample in samples],
+        'first_switch': [sample['first_switch'] for sample in samples],
+        'switch': [value for sample in samples for value in sample['switch']],
+    }
+    for page in PAGES:
+        metrics[f'rerun:{page}'] = [value for sample in samples for value in sample['rerun'][page]]
+    return {
+        name: {'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+        for name, values in metrics.items()
+    }
+
+
+def summarize_imports(import_samples, top):
+    """各模組匯入耗時取中位數，回傳最耗時的前 top 個"""
+    by_module = {}
+    for imports in import_samples:
+        for name, seconds in imports:
+            by_module.setdefault(name, []).append(seconds)
+    medians = {name: percentile(values, 50) for name, values in by_module.items()}
+    return sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def is_project_module(name):
+    return os.path.exists(os.path.join(SRC_DIR, f"{name.split('.')[0]}.py"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='量測 streamlit_app.py 的冷啟動、匯入與切換頁面耗時')
+    parser.add_argument('--iterations', type=int, default=3, help='冷啟動的次數（每次都是新的程序）')
+    parser.add_argument('--reruns', type=int, default=5, help='每次量測中切換頁面與重新執行的次數')
+    parser.add_argument('--top', type=int, default=15, help='列出最耗時的匯入數量')
+    parser.add_argument('--json', dest='json_path', help='將統計結果寫入 JSON 檔案')
+    args = parser.parse_args()
+
+    samples = []
+    import_samples = []
+    with tempfile.TemporaryDirectory() as store_dir:
+        for _ in range(args.iterations):
+            result, imports = run_probe(args.reruns, store_dir)
+            samples.append(result)
+            import_samples.append(imports)
+
+    summary = summarize(samples)
+    print(f"{'metric':<32}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for name, stats in summary.items():
+        print(f"{name:<32}{stats['p50'] * 1000:>12.1f}{stats['p95'] * 1000:>12.1f}")
+
+    imports = summarize_imports(import_samples, args.top)
+    print("\n最耗時的匯入（累計，* 為專案模組）")
+    for name, seconds in imports:
+        marker = '*' if is_project_module(name) else ' '
+        print(f"{marker} {name:<48}{seconds * 1000:>10.1f} ms")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'imports': imports}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""本機 OpenAI 相容的 chat.completions 模擬伺服器
+
+依提示詞類型回傳格式正確的固定內容（關鍵字、研究題目、研究目的、文獻探討架構、
+文獻分析 JSON 等），並可設定延遲、產生速度、串流與錯誤注入，用於離線測量整體流程效能。
+
+使用方式：
+    python benchmarks/fake_openai_server.py --port 8900 --latency 0.2 --tokens-per-second 400
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=test streamlit run streamlit_app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class FakeServerConfig:
+    """模擬伺服器設定"""
+    latency: float = 0.05
+    connect_latency: float = 0.0
+    tokens_per_second: float = 2000.0
+    error_rate: float = 0.0
+    error_status: int = 429
+    retry_after: float = 1.0
+    chunk_size: int = 8
+    invalid_item_rate: float = 0.0
+    seed: int = None
+
+
+KEYWORDS_RESPONSE = """設計思考 / Design Thinking
+使用者經驗 / User Experience
+介面設計 / Interface Design
+互動設計 / Interaction Design
+參與式設計 / Participatory Design
+服務設計 / Service Design"""
+
+SEARCH_QUERY_RESPONSE = (
+    "How do design thinking and participatory design methods improve user experience "
+    "in interface and interaction design research?"
+)
+
+TITLES_RESPONSE = """===建議研究題目===
+1. 理論導向：
+設計思考於使用者經驗研究之理論框架建構 / Constructing a Theoretical Framework of Design Thinking for User Experience Research
+（基於文獻分析，聚焦於設計思考理論框架的研究）
+
+2. 實務導向：
+參與式設計應用於介面設計流程之實證研究 / An Empirical Study of Participatory Design in the Interface Design Process
+（針對介面設計流程的溝通問題，提出解決方案）
+
+3. 整合導向：
+整合設計思考與服務設計之互動設計方法研究 / Integrating Design Thinking and Service Design in Interaction Design Methods
+（結合設計思考理論基礎與服務設計實務應用的創新研究）"""
+
+PARAGRAPH = (
+    "目前設計研究領域對於使用者經驗的探討日益深入，然而既有研究多聚焦於單一面向，"
+    "因此本研究藉由整合設計思考與參與式設計的觀點（王小明，2020；Brown, 2009），"
+    "探討介面設計流程中使用者參與的角色與成效。"
+)
+
+REFERENCES = """王小明（2020）。設計思考於互動設計之應用。設計學報，25（2），1-20。
+Brown, T. (2009). Change by design. Harper Business.
+Sanders, E. B.-N., & Stappers, P. J. (2008). Co-creation and the new landscapes of design. CoDesign, 4(1), 5-18."""
+
+
+def _section_response(content_marker, prompt):
+    # 依提示詞要求的「至少 N 字」產生對應長度的內容（優先採用變數區的字數要求）
+    match = re.search(r'字數要求：至少 ?(\d+)', prompt) or re.search(r'至少 ?(\d+) ?字', prompt)
+    min_chars = int(match.group(1)) if match else 1000
+    paragraphs = max(1, -(-min_chars // len(PARAGRAPH)))
+    body = '\n\n'.join(PARAGRAPH for _ in range(paragraphs))
+    return f"{content_marker}\n{body}\n\n===參考文獻===\n{REFERENCES}"
+
+
+def _sections_outline_response():
+    blocks = []
+    for index, title in enumerate(['設計思考理論基礎', '使用者經驗評估方法', '參與式設計實務應用'], start=1):
+        blocks.append(
+            f"===段落{index}===\n標題：{title}\n說明：探討{title}的相關研究與發展脈絡\n"
+            f"搜尋關鍵字：{title} / Design Research"
+        )
+    return '\n\n'.join(blocks)
+
+
+def _transitions_response(prompt):
+    count = max([int(n) for n in re.findall(r'===轉折(\d+)===', prompt)] or [0])
+    blocks = ["===開場===\n本章依序探討設計思考的理論基礎、評估方法與實務應用，以建立本研究的理論架構。"]
+    blocks += [f"===轉折{index}===\n在理解前述觀點之後，下一節將進一步探討相關的研究發現。" for index in range(1, count + 1)]
+    return '\n\n'.join(blocks)
+
+
+def _research_purpose_json():
+    sections = []
+    for index, title in enumerate(['設計思考理論基礎', '使用者經驗評估方法', '參與式設計實務應用'], start=1):
+        sections.append({
+            'title_zh': title,
+            'title_en': f'Section {index}',
+            'description': f'本章節探討{title}的理論與實務',
+            'subtitles': [
+                {
+                    'subtitle_zh': f'{title}之小節{sub}',
+                    'subtitle_en': f'Subsection {index}.{sub}',
+                    'content_focus': f'{title}的重點{sub}'
+                }
+                for sub in range(1, 4)
+            ],
+            'search_queries': [
+                {
+                    'focus': f'{title}的研究趨勢',
+                    'query': f'What are recent research trends in section {index} of design research?'
+                }
+            ]
+        })
+    return json.dumps({'sections': sections}, ensure_ascii=False, indent=2)
+
+
+def _literature_json(prompt):
+    match = re.search(r'輸入內容：\n(.*?)(?:\n\n請使用以下 JSON|\n【格式修正】|\Z)', prompt, re.S)
+    entries = [entry.strip() for entry in re.split(r'\n\s*\n', match.group(1))] if match else ['']
+    literature = []
+    for entry in entries:
+        number = re.match(r'文獻 (\d+)：', entry)
+        entry = entry[number.end():].strip() if number else entry
+        if not entry:
+            continue
+        lines = entry.splitlines()
+        literature.append({
+            'index': int(number.group(1)) if number else len(literature) + 1,
+            'citation': lines[0],
+            'abstract': ' '.join(lines[1:]) or lines[0],
+            'relevance': '與本章節的核心概念高度相關',
+            'contribution': '提供本章節的理論基礎',
+            'usage_suggestion': '可於章節開頭引用作為理論依據'
+        })
+    return json.dumps({'literature': literature}, ensure_ascii=False, indent=2)
+
+
+def _assessment_json(prompt):
+    count = len(re.findall(r'^文獻 \d+：', prompt, re.M))
+    assessments = [
+        {
+            'index': index,
+            'relevance': '與本章節的核心概念高度相關',
+            'contribution': '提供本章節的理論基礎',
+            'usage_suggestion': '可於章節開頭引用作為理論依據'
+        }
+        for index in range(1, count + 1)
+    ]
+    return json.dumps({'assessments': assessments}, ensure_ascii=False, indent=2)
+
+
+def corrupt_json_items(text, rng, rate):
+    """以 rate 的機率刪除 JSON 陣列中每個項目的最後一個欄位，模擬模型漏掉欄位的回應"""
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError:
+        return text
+    for items in payload.values():
+        for item in items if isinstance(items, list) else []:
+            fields = [name for name in item if name != 'index']
+            if fields and rng.random() < rate:
+                del item[fields[-1]]
+    return json.dumps(payload, ensure_ascii=False, indent=2)
+
+
+def build_response_text(messages):
+    """依提示詞內容判斷請求類型，回傳對應格式的固定內容"""
+    prompt = '\n'.join(str(message.get('content', '')) for message in messages)
+    if '"sections"' in prompt:
+        return _research_purpose_json()
+    if '"assessments"' in prompt:
+        return _assessment_json(prompt)
+    if '"literature"' in prompt:
+        return _literature_json(prompt)
+    if '===開場===' in prompt:
+        return _transitions_response(prompt)
+    if '===段落1===' in prompt:
+        return _sections_outline_response()
+    if '===建議研究題目===' in prompt:
+        return TITLES_RESPONSE
+    if '===研究目的===' in prompt:
+        return _section_response('===研究目的===', prompt)
+    if '===文獻探討===' in prompt:
+        return _section_response('===文獻探討===', prompt)
+    if 'academic search quer' in prompt:
+        return SEARCH_QUERY_RESPONSE
+    if '關鍵字' in prompt:
+        return KEYWORDS_RESPONSE
+    return PARAGRAPH
+
+
+def count_tokens(text):
+    """粗估 token 數（僅供模擬回應的 usage 欄位與產生速度使用）"""
+    return max(1, len(text) // 2)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """處理 /v1/chat/completions 請求"""
+    protocol_version = 'HTTP/1.1'
+    # 標頭與內容分開寫入，未關閉 Nagle 演算法時保持連線的請求會多出約 40ms 的延遲確認等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        # 每個新連線計數一次，並以 connect_latency 模擬 TCP/TLS 交握的成本
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+        time.sleep(self.server.config.connect_latency)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+            return
+
+        time.sleep(config.latency)
+        with self.server.lock:
+            self.server.request_count += 1
+            inject_error = self.server.random.random() < config.error_rate
+        if inject_error:
+            self._send_json(
+                config.error_status,
+                {'error': {'message': 'Injected error from fake server', 'type': 'rate_limit_error'}},
+                headers={'Retry-After': str(config.retry_after)}
+            )
+            return
+
+        messages = request.get('messages', [])
+        text = build_response_text(messages)
+        # 修補請求一律回傳完整內容
+        if config.invalid_item_rate and not any('【格式修正】' in str(m.get('content', '')) for m in messages):
+            with self.server.lock:
+                text = corrupt_json_items(text, self.server.random, config.invalid_item_rate)
+        model = request.get('model', 'gpt-3.5-turbo')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        if request.get('stream'):
+            self._stream_response(completion_id, created, model, text)
+            return
+
+        time.sleep(count_tokens(text) / config.tokens_per_second)
+        prompt_tokens = count_tokens(''.join(str(message.get('content', '')) for message in messages))
+        completion_tokens = count_tokens(text)
+        self._send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': text},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def _stream_response(self, completion_id, created, model, text):
+        """以 Server-Sent Events 逐段回傳內容"""
+        config = self.server.config
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def send_chunk(delta, finish_reason=None):
+            payload = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        send_chunk({'role': 'assistant', 'content': ''})
+        for start in range(0, len(text), config.chunk_size):
+            chunk = text[start:start + config.chunk_size]
+            time.sleep(count_tokens(chunk) / config.tokens_per_second)
+            send_chunk({'content': chunk})
+        send_chunk({}, finish_reason='stop')
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_server(config=None, host='127.0.0.1', port=0):
+    """在背景執行緒啟動模擬伺服器，回傳 (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.config = config or FakeServerConfig()
+    server.lock = threading.Lock()
+    server.random = random.Random(server.config.seed)
+    server.request_count = 0
+    server.connection_count = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本機 OpenAI 相容的 chat.completions 模擬伺服器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.05, help='每個請求的固定延遲（秒）')
+    parser.add_argument('--connect-latency', type=float, default=0.0, help='每個新連線的交握延遲（秒）')
+    parser.add_argument('--tokens-per-second', type=float, default=2000.0, help='模擬的產生速度')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='注入錯誤的機率（0-1）')
+    parser.add_argument('--error-status', type=int, default=429, help='注入錯誤時的 HTTP 狀態碼')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='錯誤回應的 Retry-After 秒數')
+    parser.add_argument('--chunk-size', type=int, default=8, help='串流時每段的字元數')
+    parser.add_argument('--invalid-item-rate', type=float, default=0.0, help='JSON 回應中每個項目缺少欄位的機率（0-1）')
+    parser.add_argument('--seed', type=int, default=None, help='錯誤注入的亂數種子')
+    args = parser.parse_args()
+
+    config = FakeServerConfig(
+        latency=args.latency,
+        connect_latency=args.connect_latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        chunk_size=args.chunk_size,
+        invalid_item_rate=args.invalid_item_rate,
+        seed=args.seed
+    )
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"模擬伺服器已啟動：{base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
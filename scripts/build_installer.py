@@ -16,9 +16,11 @@ block_cipher = None
 
 a = Analysis(
     ['../src/app.py'],
-    pathex=[],
+    pathex=['../src'],
     binaries=[],
     datas=[
+        ('../src/*.py', 'src'),
+        ('../streamlit_app.py', '.'),
         ('../.env.example', '.'),
         ('../README.md', '.'),
         ('../requirements.txt', '.'),
@@ -88,9 +90,10 @@ def build_windows_installer():
     
     # 複製必要檔案
     print("複製檔案...")
+    # 頁面會匯入 src 中的其他模組（引擎、背景工作、快取等），整個 src 目錄的模組都要一併複製
     files_to_copy = [
-        "src/app.py",
-        "src/literature_analysis.py",
+        *sorted(str(path) for path in Path("src").glob("*.py")),
+        "streamlit_app.py",
         "requirements.txt",
         ".env.example",
         "README.md",
@@ -208,9 +211,11 @@ block_cipher = None
 
 a = Analysis(
     ['../src/app.py'],
-    pathex=[],
+    pathex=['../src'],
     binaries=[],
     datas=[
+        ('../src/*.py', 'src'),
+        ('../streamlit_app.py', '.'),
         ('../.env.example', '.'),
         ('../README.md', '.'),
         ('../requirements.txt', '.'),
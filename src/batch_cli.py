@@ -0,0 +1,245 @@
+"""批次執行研究寫作流程的命令列工具
+
+直接呼叫生成引擎（不需要也不會載入 Streamlit），對輸入目錄中每位學生的研究主題依序執行：
+產生關鍵字 → 研究題目 → 研究目的 → 文獻探討架構 → 各章節文獻分析 → 各章節文獻探討，
+多位學生以工作執行緒並行處理，並共用同一個速率限制器（依學生輪流排程）。
+
+每完成一個步驟就寫入 checkpoint.json，中斷後以相同指令重新執行會從未完成的步驟繼續。
+
+輸入目錄結構（每位學生一個子目錄）：
+    students/
+        alice/
+            topic.txt        研究主題
+            content.txt      研究內容
+            literature.txt   文獻資料（APA 引用格式與摘要，每篇之間空一行）
+
+使用方式：
+    python src/batch_cli.py students --output outputs --workers 4
+    python src/batch_cli.py students --output outputs --only alice --title-index 2
+    python src/batch_cli.py students --output outputs --restart
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import environment  # noqa: F401  須最先匯入：載入 .env 後其他模組才讀取設定
+import literature_engine
+import research_engine
+from engine_types import ResponseFormatError
+from paper_index import build_paper_index
+from rate_limiter import bind_request_session
+from task_pool import map_concurrently
+from token_budget import TokenUsage, bind_session_usage
+
+INPUT_FILES = {'topic': 'topic.txt', 'content': 'content.txt', 'literature': 'literature.txt'}
+CHECKPOINT_FILE = 'checkpoint.json'
+
+_print_lock = threading.Lock()
+
+
+def log(name, message):
+    with _print_lock:
+        print(f"[{time.strftime('%H:%M:%S')}] {name}：{message}", flush=True)
+
+
+def write_text_atomic(path, text):
+    """先寫入暫存檔再取代，中斷時不會留下寫到一半的檔案"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def write_json_atomic(path, data):
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def read_inputs(student_dir):
+    """讀取學生目錄中的輸入檔案，缺少研究主題或研究內容時拋出 ValueError"""
+    inputs = {}
+    for name, filename in INPUT_FILES.items():
+        path = os.path.join(student_dir, filename)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                inputs[name] = f.read().strip()
+        else:
+            inputs[name] = ''
+    missing = [INPUT_FILES[name] for name in ('topic', 'content') if not inputs[name]]
+    if missing:
+        raise ValueError(f"缺少輸入檔案：{'、'.join(missing)}")
+    return inputs
+
+
+def find_students(input_dir, only=None):
+    """列出輸入目錄中的學生子目錄（依名稱排序）"""
+    names = sorted(
+        name for name in os.listdir(input_dir)
+        if os.path.isdir(os.path.join(input_dir, name)) and not name.startswith('.')
+    )
+    if only:
+        names = [name for name in names if name in set(only)]
+    return names
+
+
+class Checkpoint:
+    """學生的流程進度：各步驟的結果存放在 output_dir/checkpoint.json，每次更新都立即寫入"""
+
+    def __init__(self, output_dir, restart=False):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.data = {'steps': {}}
+        if not restart and os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    def get(self, step):
+        return self.data['steps'].get(step)
+
+    def save(self, step, result):
+        self.data['steps'][step] = result
+        self.data['updated_at'] = time.time()
+        write_json_atomic(self.path, self.data)
+        return result
+
+    def run(self, step, func, *args):
+        """已完成的步驟直接回傳先前的結果，否則執行並記錄"""
+        result = self.get(step)
+        if result is not None:
+            return result
+        return self.save(step, func(*args))
+
+
+def format_review_markdown(structure, reviews):
+    """將各章節的文獻探討整理成一份 Markdown"""
+    parts = []
+    for section in structure['sections']:
+        review = reviews.get(section['title_zh'])
+        if review:
+            parts.append(f"## {section['title_zh']}\n\n{review['content']}\n\n### 參考文獻\n\n{review['references']}")
+    return '\n\n'.join(parts)
+
+
+def run_student(name, input_dir, output_dir, title_index, review_workers, restart=False):
+    """執行一位學生的完整流程，回傳各步驟的 token 用量"""
+    usage = TokenUsage()
+    bind_session_usage(usage)
+    bind_request_session(f"batch:{name}")
+
+    inputs = read_inputs(os.path.join(input_dir, name))
+    student_output = os.path.join(output_dir, name)
+    os.makedirs(student_output, exist_ok=True)
+    checkpoint = Checkpoint(student_output, restart)
+
+    keywords = checkpoint.run('keywords', research_engine.request_keywords, inputs['topic'], inputs['content'])
+    write_text_atomic(os.path.join(student_output, 'keywords.txt'), '\n'.join(keywords))
+    log(name, f"已產生 {len(keywords)} 個關鍵字")
+
+    titles = checkpoint.run('titles', research_engine.request_titles, inputs['topic'], inputs['content'], inputs['literature'])
+    write_text_atomic(os.path.join(student_output, 'titles.md'), titles)
+    options = research_engine.parse_title_options(titles)
+    if not options:
+        raise ResponseFormatError("無法解析研究題目選項", step="generate_titles")
+    selected_title = options[min(title_index, len(options)) - 1]
+    log(name, f"選擇研究題目：{selected_title['title']}")
+
+    purpose, references = checkpoint.run(
+        'full_content', research_engine.request_full_content,
+        inputs['topic'], inputs['content'], inputs['literature'], selected_title
+    )
+    write_text_atomic(os.path.join(student_output, 'purpose.md'), purpose)
+    write_text_atomic(os.path.join(student_output, 'references.md'), references)
+    log(name, "已產生研究目的")
+
+    structure = checkpoint.run('structure', literature_engine.request_research_structure, purpose)
+    write_json_atomic(os.path.join(student_output, 'structure.json'), structure)
+    log(name, f"已產生 {len(structure['sections'])} 個章節的文獻探討架構")
+
+    if not inputs['literature']:
+        log(name, f"沒有 {INPUT_FILES['literature']}，略過文獻分析與文獻探討")
+        return usage.snapshot()
+
+    # 各章節的文獻分析逐一完成並記錄，已在其他章節分析過的文獻沿用先前的結果
+    literature_data = checkpoint.get('literature') or {}
+    for section in structure['sections']:
+        title = section['title_zh']
+        if title in literature_data:
+            continue
+        result = literature_engine.request_multiple_literature(
+            title, inputs['literature'], build_paper_index(literature_data)
+        )
+        if result['failed_batches']:
+            log(name, f"「{title}」有 {len(result['failed_batches'])} 批文獻分析失敗，其餘文獻照常使用")
+        literature_data[title] = {'literature': result['literature']}
+        checkpoint.save('literature', literature_data)
+    log(name, "已完成各章節的文獻分析")
+
+    # 只產生尚未完成的章節；失敗的章節下次執行時重試
+    reviews = checkpoint.get('reviews') or {}
+    jobs = [
+        (section['title_zh'], literature_data[section['title_zh']]['literature'], section)
+        for section in structure['sections']
+        if section['title_zh'] not in reviews and literature_data[section['title_zh']]['literature']
+    ]
+    if jobs:
+        result = literature_engine.request_all_literature_reviews(jobs, review_workers)
+        reviews.update(result['reviews'])
+        checkpoint.save('reviews', reviews)
+        if result['failures']:
+            raise RuntimeError(f"{len(result['failures'])} 個章節的文獻探討產生失敗：{'、'.join(result['failures'])}")
+    write_text_atomic(os.path.join(student_output, 'literature_review.md'), format_review_markdown(structure, reviews))
+    log(name, f"已產生 {len(reviews)} 個章節的文獻探討")
+    return usage.snapshot()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批次執行研究寫作流程（關鍵字、研究題目、研究目的、文獻探討）')
+    parser.add_argument('input_dir', help='輸入目錄，每位學生一個子目錄')
+    parser.add_argument('--output', default='outputs', help='輸出目錄')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('BATCH_WORKERS', '4')), help='同時處理的學生數')
+    parser.add_argument('--review-workers', type=int, default=literature_engine.REVIEW_CONCURRENCY,
+                        help='每位學生同時產生的章節數')
+    parser.add_argument('--title-index', type=int, default=1, help='選擇第幾個研究題目選項（1-3）')
+    parser.add_argument('--only', nargs='+', help='只處理指定的學生')
+    parser.add_argument('--restart', action='store_true', help='忽略先前的進度重新執行')
+    args = parser.parse_args(argv)
+
+    students = find_students(args.input_dir, args.only)
+    if not students:
+        print(f"在 {args.input_dir} 中找不到學生目錄", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+    log('batch', f"開始處理 {len(students)} 位學生（同時 {args.workers} 位）")
+
+    started = time.perf_counter()
+    # 保留先前執行中其他學生的結果
+    summary_path = os.path.join(args.output, 'summary.json')
+    summary = {}
+    if os.path.exists(summary_path):
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+    results = map_concurrently(
+        lambda name: run_student(
+            name, args.input_dir, args.output, max(1, args.title_index), args.review_workers, args.restart
+        ),
+        students,
+        args.workers
+    )
+    for index, usage, error in results:
+        name = students[index]
+        if error is not None:
+            log(name, f"失敗：{error}（重新執行相同指令可從中斷的步驟繼續）")
+            summary[name] = {'status': 'failed', 'step': getattr(error, 'step', None), 'error': str(error)}
+        else:
+            log(name, "完成")
+            summary[name] = {'status': 'done', 'usage': usage}
+
+    write_json_atomic(summary_path, summary)
+    failed = [name for name in students if summary[name]['status'] == 'failed']
+    log('batch', f"完成 {len(students) - len(failed)}/{len(students)} 位學生，耗時 {time.perf_counter() - started:.1f} 秒")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+from collections import namedtuple
+
+from paper_index import paper_identity
+from token_budget import count_tokens, truncate_to_tokens
+
+# 文獻探討提示詞的文獻資料打包：以精簡的條列格式取代縮排 JSON，並在 token 預算內依序
+# 1. 略過同一章節中重複的文獻與空白欄位
+# 2. 預算不足時省略次要欄位（模型先前撰寫的相關性說明）
+# 3. 仍不足時把所有過長的摘要裁切到同一個上限（上限盡量取大，短摘要不受影響）
+# 4. 摘要已裁到 CONTEXT_MIN_ABSTRACT_TOKENS 仍不足時，由文獻最多的章節末尾（優先順序最低）開始略過
+# 並回報與縮排 JSON 相比節省的 token 數。
+
+CONTEXT_MIN_ABSTRACT_TOKENS = int(os.getenv('CONTEXT_MIN_ABSTRACT_TOKENS', '80'))
+
+# 提示詞中各欄位的順序與標籤；摘要可能存放在 abstract、summary 或 content 欄位
+PACKED_FIELDS = (('abstract', '摘要'), ('contribution', '貢獻'), ('relevance', '相關性'))
+ABSTRACT_SOURCES = ('abstract', 'summary', 'content')
+# 預算不足時最先省略的欄位
+OPTIONAL_FIELDS = ('relevance',)
+ABSTRACT_ELLIPSIS = '…'
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# included 為實際放入 text 的文獻（原本的 dict，依打包後的順序）
+PackedContext = namedtuple('PackedContext', ['text', 'report', 'included'])
+
+
+def _clean(value):
+    return WHITESPACE_PATTERN.sub(' ', value).strip() if isinstance(value, str) else ''
+
+
+def normalize_paper(paper):
+    """取出打包需要的欄位並去除多餘空白；空白欄位與內容和摘要相同的欄位不保留"""
+    entry = {'citation': _clean(paper.get('citation'))}
+    entry['abstract'] = next((_clean(paper.get(name)) for name in ABSTRACT_SOURCES if _clean(paper.get(name))), '')
+    for field, _ in PACKED_FIELDS[1:]:
+        value = _clean(paper.get(field))
+        if value and value != entry['abstract']:
+            entry[field] = value
+    return {field: value for field, value in entry.items() if value}
+
+
+def format_entry(number, entry, fields, abstract=None):
+    lines = [f"[{number}] {entry.get('citation', '（無引用格式）')}"]
+    for field, label in PACKED_FIELDS:
+        value = abstract if field == 'abstract' and abstract is not None else entry.get(field)
+        if field in fields and value:
+            lines.append(f"{label}：{value}")
+    return '\n'.join(lines)
+
+
+def _render(groups, items, fields, abstracts):
+    parts = []
+    number = 0
+    for index, heading in enumerate(groups):
+        entries = []
+        for item in items:
+            if item['group'] == index:
+                number += 1
+                entries.append(format_entry(number, item['entry'], fields, abstracts.get(item['id'])))
+        if not entries:
+            continue
+        parts.append('\n\n'.join(([f"【{heading}】"] if heading is not None else []) + entries))
+    return '\n\n'.join(parts)
+
+
+def _abstract_cap(fixed_tokens, abstract_tokens, budget):
+    """求摘要的共同上限 c，使 sum(固定部分) + sum(min(摘要, c)) 不超過預算；全部放得下時回傳 None"""
+    remaining = budget - sum(fixed_tokens)
+    ordered = sorted(abstract_tokens)
+    for position, tokens in enumerate(ordered):
+        left = len(ordered) - position
+        if tokens * left > remaining:
+            return max(remaining // left, 0)
+        remaining -= tokens
+    return None
+
+
+def pack_literature_groups(groups, max_tokens, model='gpt-3.5-turbo'):
+    """將 [(章節標題或 None, 文獻列表)] 打包成不超過 max_tokens 的提示詞文字，回傳 PackedContext
+
+    文獻列表的順序即優先順序（越前面越重要）；report 記錄篇數、重複、裁切與略過的篇數，
+    以及打包後與縮排 JSON 的 token 數。
+    """
+    headings = [heading for heading, _ in groups]
+    items = []
+    duplicates = 0
+    # 與打包前的做法比較：相同欄位以縮排 JSON 序列化（多個章節時以章節標題為鍵）
+    original = {}
+    for index, (heading, papers) in enumerate(groups):
+        seen = set()
+        for paper in papers:
+            entry = normalize_paper(paper)
+            key = paper_identity(paper)
+            if not key or not entry:
+                continue
+            original.setdefault(heading, []).append(entry)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            items.append({'id': len(items), 'group': index, 'entry': entry, 'paper': paper})
+    json_tokens = count_tokens(
+        json.dumps(original if len(groups) > 1 else original.get(headings[0], []), ensure_ascii=False, indent=2), model
+    )
+    report = {
+        'papers': sum(len(papers) for _, papers in groups), 'included': len(items), 'duplicates': duplicates,
+        'trimmed': 0, 'dropped': 0, 'omitted_fields': [], 'json_tokens': json_tokens, 'packed_tokens': 0,
+        'budget': max_tokens
+    }
+
+    fields = [field for field, _ in PACKED_FIELDS]
+    abstracts = {}
+    text = _render(headings, items, fields, abstracts)
+    tokens = count_tokens(text, model)
+    if tokens > max_tokens:
+        fields = [field for field in fields if field not in OPTIONAL_FIELDS]
+        report['omitted_fields'] = [
+            field for field in OPTIONAL_FIELDS if any(field in item['entry'] for item in items)
+        ]
+        text = _render(headings, items, fields, abstracts)
+        tokens = count_tokens(text, model)
+
+    if tokens > max_tokens and items:
+        # 以各篇的 token 數估算：標題與段落分隔的額外開銷由最後的實際計算修正
+        overhead = count_tokens(text, model) - sum(
+            count_tokens(format_entry(0, item['entry'], fields), model) for item in items
+        )
+        budget = max_tokens - max(overhead, 0)
+        abstract_tokens = {item['id']: count_tokens(item['entry'].get('abstract', ''), model) for item in items}
+        fixed_tokens = {
+            item['id']: count_tokens(format_entry(0, item['entry'], fields), model) - abstract_tokens[item['id']]
+            for item in items
+        }
+        cap = _abstract_cap(fixed_tokens.values(), abstract_tokens.values(), budget)
+        if cap is not None and cap < CONTEXT_MIN_ABSTRACT_TOKENS:
+            cap = CONTEXT_MIN_ABSTRACT_TOKENS
+            # 摘要裁到下限仍放不下時，由文獻最多的章節末尾開始略過
+            total = sum(fixed_tokens[item['id']] + min(abstract_tokens[item['id']], cap) for item in items)
+            while total > budget and items:
+                counts = [sum(item['group'] == index for item in items) for index in range(len(headings))]
+                group = max(range(len(counts)), key=lambda index: (counts[index], index))
+                position = max(position for position, item in enumerate(items) if item['group'] == group)
+                dropped = items.pop(position)
+                total -= fixed_tokens[dropped['id']] + min(abstract_tokens[dropped['id']], cap)
+                report['dropped'] += 1
+        if cap is not None:
+            for item in items:
+                if abstract_tokens[item['id']] > cap:
+                    abstracts[item['id']] = truncate_to_tokens(
+                        item['entry']['abstract'], cap, model, head_ratio=1.0, notice=ABSTRACT_ELLIPSIS
+                    )
+        text = _render(headings, items, fields, abstracts)
+        tokens = count_tokens(text, model)
+        # 估算與實際計算的差距由末尾逐篇略過修正
+        while tokens > max_tokens and items:
+            items.pop()
+            report['dropped'] += 1
+            text = _render(headings, items, fields, abstracts)
+            tokens = count_tokens(text, model)
+        report['trimmed'] = sum(item['id'] in abstracts for item in items)
+
+    report['included'] = len(items)
+    report['packed_tokens'] = tokens
+    return PackedContext(text, report, [item['paper'] for item in items])
+
+
+def pack_literature(papers, max_tokens, model='gpt-3.5-turbo'):
+    """將單一章節的文獻打包成不超過 max_tokens 的提示詞文字，回傳 PackedContext"""
+    return pack_literature_groups([(None, papers)], max_tokens, model)
+
+
+def merge_pack_reports(reports):
+    """合併多次打包的報告（例如分節撰寫時各節的報告）"""
+    merged = {
+        'papers': 0, 'included': 0, 'duplicates': 0, 'trimmed': 0, 'dropped': 0, 'omitted_fields': [],
+        'json_tokens': 0, 'packed_tokens': 0, 'budget': 0
+    }
+    for report in reports:
+        for name, value in report.items():
+            if name == 'omitted_fields':
+                merged[name].extend(field for field in value if field not in merged[name])
+            else:
+                merged[name] += value
+    return merged
+
+
+def format_pack_report(report):
+    """將打包報告整理成一行說明文字"""
+    saved = report['json_tokens'] - report['packed_tokens']
+    ratio = saved / report['json_tokens'] if report['json_tokens'] else 0
+    details = [f"文獻資料 {report['packed_tokens']:,} tokens（縮排 JSON 約 {report['json_tokens']:,} tokens，節省 {ratio:.0%}）"]
+    if report['duplicates']:
+        details.append(f"略過重複 {report['duplicates']} 篇")
+    if report['omitted_fields']:
+        labels = dict(PACKED_FIELDS)
+        details.append(f"省略{'、'.join(labels[field] for field in report['omitted_fields'])}欄位")
+    if report['trimmed']:
+        details.append(f"裁切 {report['trimmed']} 篇摘要")
+    if report['dropped']:
+        details.append(f"超出預算略過 {report['dropped']} 篇")
+    return '，'.join(details)
@@ -0,0 +1,45 @@
+import functools
+from collections import namedtuple
+
+# 生成引擎共用的結果型別與例外。引擎不依賴 Streamlit，失敗時一律拋出這裡定義的例外，
+# 由呼叫端（Streamlit 頁面、批次工具、背景工作）決定如何呈現。
+
+
+class EngineError(Exception):
+    """生成引擎的錯誤基底類別；step 為發生錯誤的步驟名稱"""
+
+    def __init__(self, message, step=None):
+        super().__init__(message)
+        self.step = step
+
+
+class ResponseFormatError(EngineError, ValueError):
+    """模型回應的格式無法解析"""
+
+
+class GenerationError(EngineError):
+    """呼叫模型失敗（連線、逾時、超過 token 上限等），原始例外保留在 __cause__"""
+
+
+# 研究目的與參考文獻
+FullContent = namedtuple('FullContent', ['purpose', 'references'])
+
+# 文獻探討全文的開場段落與各節之間的轉折句
+ReviewTransitions = namedtuple('ReviewTransitions', ['intro', 'transitions'])
+
+
+def engine_step(step):
+    """標記引擎函式所屬的步驟：其他例外轉為 GenerationError，引擎例外未標記步驟時補上"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except EngineError as e:
+                if e.step is None:
+                    e.step = step
+                raise
+            except Exception as e:
+                raise GenerationError(str(e), step) from e
+        return wrapper
+    return decorate
@@ -0,0 +1,6 @@
+from dotenv import load_dotenv
+
+# 程序啟動時的一次性初始化：載入 .env 的環境變數。
+# 各模組在匯入時就讀取設定（例如 LLM_CACHE_ENABLED、OPENAI_READ_TIMEOUT），
+# 因此入口模組須在匯入其他模組之前先匯入此模組；模組只會執行一次，重複匯入不會重新讀取 .env。
+load_dotenv()
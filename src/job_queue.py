@@ -0,0 +1,293 @@
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from rate_limiter import get_rate_limiter
+from session_store import get_session_token
+
+# 背景工作設定：同時執行的工作數、等待結果時的輪詢間隔（秒）
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.3"))
+
+# 工作狀態
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class JobQueue:
+    """以執行緒池在背景執行 LLM 工作，結果存入 SQLite；頁面重新整理或連線中斷後仍可取回"""
+
+    def __init__(self, path, max_workers=4, ttl=7 * 24 * 3600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._progress = {}
+        self._published = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='job')
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                seen INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs (session_id, kind, created_at)')
+        # 上次程序結束時尚未完成的工作已無法繼續執行
+        self._conn.execute(
+            'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)',
+            (FAILED, '伺服器重新啟動，工作已中斷，請重新執行', time.time(), QUEUED, RUNNING)
+        )
+        self.purge_expired()
+
+    def submit(self, session_id, kind, func, *args, **kwargs):
+        """送出背景工作並回傳工作 ID；func 的回傳值必須可以轉成 JSON"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (job_id, session_id, kind, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, session_id, kind, QUEUED, now, now)
+            )
+        # 在送出端 context 的複本中執行，讓 token 用量等 session 狀態延續到背景執行緒
+        self._executor.submit(contextvars.copy_context().run, self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        _current_job.set(job_id)
+        self._update(job_id, status=RUNNING)
+        try:
+            result = func(*args, **kwargs)
+            self._update(job_id, status=DONE, result=json.dumps(result, ensure_ascii=False))
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=str(e) or type(e).__name__)
+        finally:
+            with self._lock:
+                self._progress.pop(job_id, None)
+                self._published.pop(job_id, None)
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock:
+            self._conn.execute(f'UPDATE jobs SET {columns} WHERE job_id = ?', (*fields.values(), job_id))
+
+    def set_progress(self, job_id, text):
+        """記錄工作目前的部分輸出（只保存在記憶體中，工作結束後清除）"""
+        with self._lock:
+            self._progress[job_id] = text
+
+    def get_progress(self, job_id):
+        with self._lock:
+            return self._progress.get(job_id)
+
+    def publish(self, job_id, key, value):
+        """提前公布工作的部分結果（只保存在記憶體中；工作結束後以完整結果取代）"""
+        with self._lock:
+            self._published.setdefault(job_id, {})[key] = value
+
+    def get_published(self, job_id):
+        with self._lock:
+            return dict(self._published.get(job_id, {}))
+
+    def get(self, job_id):
+        """讀取單一工作，不存在時回傳 None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT job_id, kind, status, result, error, seen, created_at, updated_at FROM jobs WHERE job_id = ?',
+                (job_id,)
+            ).fetchone()
+        return self._to_record(row) if row else None
+
+    def list(self, session_id, kind, statuses=None, since=0.0):
+        """依建立順序列出 session 中指定類型的工作"""
+        query = ('SELECT job_id, kind, status, result, error, seen, created_at, updated_at FROM jobs '
+                 'WHERE session_id = ? AND kind = ? AND created_at >= ?')
+        params = [session_id, kind, since]
+        if statuses:
+            query += f" AND status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY created_at', params).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def mark_seen(self, job_ids):
+        """標記結果已顯示過，避免重新整理後重複顯示錯誤訊息"""
+        with self._lock:
+            self._conn.executemany('UPDATE jobs SET seen = 1 WHERE job_id = ?', [(job_id,) for job_id in job_ids])
+
+    def purge_expired(self):
+        """刪除超過保存期限的已結束工作"""
+        if self.ttl is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM jobs WHERE updated_at < ? AND status IN (?, ?)', (time.time() - self.ttl, DONE, FAILED)
+            )
+
+    @staticmethod
+    def _to_record(row):
+        job_id, kind, status, result, error, seen, created_at, updated_at = row
+        return {
+            'job_id': job_id,
+            'kind': kind,
+            'status': status,
+            'result': json.loads(result) if result is not None else None,
+            'error': error,
+            'seen': bool(seen),
+            'created_at': created_at,
+            'updated_at': updated_at
+        }
+
+
+class JobProgress:
+    """可當作 stream_container 傳給生成函式的容器：在背景工作中將串流內容記錄為工作進度"""
+
+    def markdown(self, text):
+        job_id = _current_job.get()
+        if job_id is not None:
+            get_job_queue().set_progress(job_id, text)
+
+    def empty(self):
+        pass
+
+
+job_progress = JobProgress()
+
+
+def publish_job_result(key, value):
+    """在背景工作中提前公布一筆部分結果（例如已完成的章節），頁面重新執行時即可以 collect_published 取回"""
+    job_id = _current_job.get()
+    if job_id is not None:
+        get_job_queue().publish(job_id, key, value)
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """取得程序共用的背景工作佇列（依環境變數設定）"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                ttl_days = float(os.getenv('JOB_STORE_TTL_DAYS', '7'))
+                _job_queue = JobQueue(
+                    os.getenv('JOB_STORE_PATH', os.path.join('.cache', 'jobs.sqlite3')),
+                    max_workers=JOB_WORKERS,
+                    ttl=ttl_days * 24 * 3600 if ttl_days > 0 else None
+                )
+    return _job_queue
+
+
+def submit_job(kind, func, *args, **kwargs):
+    """為此 session 送出背景工作，回傳工作 ID"""
+    return get_job_queue().submit(get_session_token(), kind, func, *args, **kwargs)
+
+
+def has_active_jobs(kind, since=0.0):
+    """此 session 是否有尚未完成的指定類型工作"""
+    return bool(get_job_queue().list(get_session_token(), kind, statuses=(QUEUED, RUNNING), since=since))
+
+
+def collect_published(kind, since=0.0):
+    """合併此 session 中尚未完成的指定類型工作已公布的部分結果（依建立順序，較新的工作優先）"""
+    queue = get_job_queue()
+    published = {}
+    for job in queue.list(get_session_token(), kind, statuses=(QUEUED, RUNNING), since=since):
+        published.update(queue.get_published(job['job_id']))
+    return published
+
+
+def wait_for_jobs(kind, message, placeholder=None, published=None, since=0.0):
+    """此 session 有尚未完成的指定類型工作時，顯示等待訊息並輪詢到全部完成
+
+    提供 placeholder 時一併顯示最新工作的部分輸出（例如串流中的內容）。
+    提供 published（頁面已取回的部分結果筆數）時，工作公布新的部分結果就提前結束等待，
+    讓頁面重新執行並顯示這些結果；since 需與取回這些結果時使用的 since 相同。
+    連線中斷時工作仍會在背景完成，下次執行時即可取回結果。
+    """
+    queue = get_job_queue()
+    session_id = get_session_token()
+    active = queue.list(session_id, kind, statuses=(QUEUED, RUNNING), since=since)
+    if not active:
+        return
+    limiter = get_rate_limiter()
+    queue_status = st.empty()
+    with st.spinner(message):
+        while active:
+            # 速率額度用盡時顯示此 session 的排隊位置，而不是直接失敗
+            position = limiter.queue_position(session_id)
+            if position > 1:
+                queue_status.caption(f"⏳ 目前使用人數較多，排隊中：前面還有 {position - 1} 位使用者的請求")
+            elif position == 1:
+                queue_status.caption("⏳ 即將送出請求，等待 API 速率額度...")
+            else:
+                queue_status.empty()
+            if placeholder is not None:
+                progress = queue.get_progress(active[-1]['job_id'])
+                if progress:
+                    placeholder.markdown(progress)
+            time.sleep(JOB_POLL_INTERVAL)
+            active = queue.list(session_id, kind, statuses=(QUEUED, RUNNING), since=since)
+            if published is not None and active and len(collect_published(kind, since)) > published:
+                break
+    queue_status.empty()
+    if placeholder is not None:
+        placeholder.empty()
+
+
+def collect_jobs(kind, since=0.0):
+    """取回此 session 中尚未在本次瀏覽階段處理過的已結束工作（依建立順序）
+
+    成功的工作在重新整理頁面後會再次回傳，用來還原 session state；
+    失敗的工作只回傳一次，避免重複顯示錯誤訊息。
+    """
+    queue = get_job_queue()
+    # 依工作類型記錄已處理的工作 ID，快照只需重寫有變更的類型；
+    # 只保留仍在工作儲存區中的 ID，已過期刪除的工作不會再被列出，記錄不會無限增長
+    collected = st.session_state.get('_collected_jobs')
+    if not isinstance(collected, dict):
+        collected = st.session_state._collected_jobs = {}
+    finished = queue.list(get_session_token(), kind, statuses=(DONE, FAILED))
+    seen_ids = collected.pop(kind, set())
+    kept = seen_ids & {job['job_id'] for job in finished}
+    jobs = []
+    for job in finished:
+        if job['created_at'] < since or job['job_id'] in seen_ids:
+            continue
+        kept.add(job['job_id'])
+        if job['status'] == FAILED and job['seen']:
+            continue
+        jobs.append(job)
+    if kept:
+        collected[kind] = kept
+    queue.mark_seen([job['job_id'] for job in jobs])
+    return jobs
+
+
+def collect_latest_job(kind, since=0.0):
+    """只取回最新一個尚未處理的已結束工作，較舊的結果直接略過"""
+    jobs = collect_jobs(kind, since)
+    return jobs[-1] if jobs else None
@@ -0,0 +1,139 @@
+import json
+import re
+
+# 增量解析串流中的 JSON 回應：陣列中的每個物件一結束就可以取出，不必等整份回應完成；
+# 回應被截斷時修補尾端，保留已完整的部分。
+
+KEY_BEFORE_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+
+CLOSERS = {'{': '}', '[': ']'}
+
+
+class JsonArrayStreamParser:
+    """逐段輸入 JSON 文字，在最外層物件的 array_key 陣列中每個元素物件結束時立即解析並回傳
+
+    JSON 之前的說明文字或 ```json 標記會被略過。
+    """
+
+    def __init__(self, array_key):
+        self.array_key = array_key
+        self.items = []
+        self._text = ''
+        self._position = 0
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._target_depth = None
+        self._item_start = None
+
+    @property
+    def text(self):
+        """目前收到的 JSON 文字（由第一個 { 開始）"""
+        return self._text[self._start:] if self._start is not None else ''
+
+    def feed(self, chunk):
+        """輸入一段串流文字，回傳這段文字中新完成的陣列元素"""
+        self._text += chunk
+        completed = []
+        text = self._text
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._start is None:
+                if char == '{':
+                    self._start = index
+                else:
+                    continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in CLOSERS:
+                self._open(char, index)
+            elif char in '}]' and self._stack:
+                item = self._close(index)
+                if item is not None:
+                    completed.append(item)
+        self._position = len(text)
+        self.items.extend(completed)
+        return completed
+
+    def _open(self, char, index):
+        depth = len(self._stack)
+        if char == '[' and depth == 1 and self._target_depth is None:
+            match = KEY_BEFORE_PATTERN.search(self._text, self._start, index)
+            if match and match.group(1) == self.array_key:
+                self._target_depth = 2
+        elif char == '{' and self._target_depth == depth == 2:
+            self._item_start = index
+        self._stack.append(char)
+
+    def _close(self, index):
+        opener = self._stack.pop()
+        depth = len(self._stack)
+        if opener == '[' and self._target_depth == 2 and depth == 1:
+            # 陣列已結束，之後的內容不再視為元素
+            self._target_depth = -1
+        if opener == '{' and self._target_depth == 2 and depth == 2 and self._item_start is not None:
+            raw = self._text[self._item_start:index + 1]
+            self._item_start = None
+            try:
+                return json.loads(raw)
+            except json.JSONDecodeError:
+                return None
+        return None
+
+
+def repair_truncated_json(text):
+    """修補被截斷的 JSON 文字：捨棄最後一個不完整的值並補上未關閉的括號，無法修補時回傳 None
+
+    例如 '{"sections": [{"a": 1}, {"b": "未完' 會修補為 {"sections": [{"a": 1}, {}]}。
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    text = text[start:]
+    stack = []
+    in_string = False
+    escape = False
+    # 可以安全截斷的位置（該位置之前的值都是完整的）與當時尚未關閉的括號
+    cut_points = []
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(char)
+            cut_points.append((index + 1, tuple(stack)))
+        elif char in '}]' and stack:
+            stack.pop()
+            cut_points.append((index + 1, tuple(stack)))
+            if not stack:
+                break
+        elif char == ',':
+            cut_points.append((index, tuple(stack)))
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    for position, open_brackets in reversed(cut_points):
+        candidate = text[:position] + ''.join(CLOSERS[char] for char in reversed(open_brackets))
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
@@ -0,0 +1,507 @@
+import json
+import os
+import re
+
+import environment  # noqa: F401  須最先匯入：載入 .env 後其他模組才讀取設定
+from context_packer import pack_literature
+from engine_types import ResponseFormatError, engine_step
+from json_stream import JsonArrayStreamParser
+from literature_parser import parse_citation, parse_literature_entry
+from llm_gateway import complete_chat, stream_chat
+from openai_client import LazyOpenAIClient
+from paper_index import PAPER_FIELDS, entry_key, paper_identity, paper_key
+from prompt_templates import render_prompt
+from section_stream import (
+    complete_chat_streamed, has_content_and_references, merge_references, split_content_and_references
+)
+from structured_output import (
+    ASSESSMENT_SCHEMA, LITERATURE_SCHEMA, SECTION_SCHEMA, ListSchema, group_items_by_index, parse_json_items,
+    validate_and_repair, with_repair_note
+)
+from task_pool import map_concurrently
+from token_budget import count_tokens, truncate_to_tokens
+
+# 文獻探討架構、文獻分析與各章節文獻探討的生成引擎：不依賴 Streamlit，可在 Streamlit 頁面、背景工作、批次工具與執行緒池中呼叫。
+# 失敗時拋出 engine_types 定義的例外；stream_container / progress_container 只需提供 markdown(text) 方法。
+
+# 共用的 OpenAI 客戶端（各頁面共用同一個連線池），第一次呼叫 API 時才建立
+client = LazyOpenAIClient()
+
+# 「產生所有章節」時預設同時執行的章節數
+REVIEW_CONCURRENCY = int(os.getenv("REVIEW_CONCURRENCY", "3"))
+
+# 文獻分析分批設定：每批輸入 token 上限、每批篇數上限、並行批次數與失敗重試次數
+LITERATURE_BATCH_TOKENS = int(os.getenv("LITERATURE_BATCH_TOKENS", "2500"))
+LITERATURE_BATCH_SIZE = int(os.getenv("LITERATURE_BATCH_SIZE", "4"))
+LITERATURE_CONCURRENCY = int(os.getenv("LITERATURE_CONCURRENCY", "4"))
+LITERATURE_BATCH_RETRIES = int(os.getenv("LITERATURE_BATCH_RETRIES", "2"))
+
+# 本機解析文獻格式：解析成功的文獻只請模型評估相關性、貢獻與引用建議（無法解析的仍交由模型完整分析）
+LITERATURE_LOCAL_PARSER = os.getenv("LITERATURE_LOCAL_PARSER", "true").lower() not in ('0', 'false', 'no')
+ASSESSMENT_BATCH_SIZE = int(os.getenv("ASSESSMENT_BATCH_SIZE", "8"))
+ASSESSMENT_ABSTRACT_MAX_TOKENS = int(os.getenv("ASSESSMENT_ABSTRACT_MAX_TOKENS", "400"))
+
+# 文獻探討提示詞中文獻資料的 token 上限
+REVIEW_LITERATURE_MAX_TOKENS = int(os.getenv("REVIEW_LITERATURE_MAX_TOKENS", "8000"))
+# 章節文獻超過此篇數時，只把本機排序（BM25）最相關的前幾篇放進文獻探討提示詞；0 表示全部放入
+REVIEW_TOP_K = int(os.getenv("REVIEW_TOP_K", "20"))
+
+def extract_json_from_response(content):
+    """從回應中擷取 JSON 內容"""
+    # 嘗試找出 JSON 內容的開始和結束
+    try:
+        # 找出第一個 { 和最後一個 } 的位置
+        start = content.find('{')
+        end = content.rfind('}') + 1
+        if start != -1 and end != -1:
+            json_str = content[start:end]
+            return json.loads(json_str)
+    except:
+        pass
+    return None
+
+def parse_structure_json(content):
+    """解析完整的文獻探討架構回應，回傳含 sections 列表的 dict；回應被截斷或無法解析時回傳 None"""
+    content = content.strip()
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError:
+        result = extract_json_from_response(content)
+    if isinstance(result, dict) and isinstance(result.get('sections'), list) and result['sections']:
+        return result
+    return None
+
+def format_structure_progress(sections):
+    """將已完成的章節整理成串流中顯示的 Markdown"""
+    return '\n\n'.join(
+        f"**{number}. {section.get('title_zh', '')}**\n\n{section.get('description', '')}"
+        for number, section in enumerate(sections, start=1)
+    )
+
+@engine_step("analyze_research_purpose")
+def request_research_structure(research_purpose, stream_container=None):
+    """呼叫模型分析研究目的並產生文獻探討架構，無法解析回應時拋出 ResponseFormatError
+
+    提供 stream_container 時以串流方式生成，每個章節完成就立即顯示。
+    章節缺少欄位時只請模型修補這些章節；回應被截斷或修補失敗時保留完整的章節，並在結果中標記 'truncated': True。
+    """
+    params = dict(
+        step="analyze_research_purpose",
+        # 只快取完整且可解析的架構；截斷或無法解析的回應在重新產生時會重新呼叫模型
+        validate=parse_structure_json,
+        model="gpt-3.5-turbo",
+        messages=render_prompt('research_structure', research_purpose=research_purpose),
+        temperature=0.3
+    )
+    parser = JsonArrayStreamParser('sections')
+    if stream_container is None:
+        content = complete_chat(client, **params)
+        parser.feed(content)
+    else:
+        parts = []
+        for chunk in stream_chat(client, **params):
+            parts.append(chunk)
+            if parser.feed(chunk):
+                stream_container.markdown(format_structure_progress(parser.items) + ' ▌')
+        content = ''.join(parts)
+    content = content.strip()
+    
+    # 嘗試直接解析，失敗時再嘗試擷取 JSON 部分；回應被截斷時修補尾端，修補失敗則使用串流中已完成的章節
+    truncated = False
+    result = parse_structure_json(content)
+    if result is None:
+        truncated = True
+        # 截斷處修補出的空物件不算章節
+        result = {'sections': [section for section in parse_json_items(content, 'sections') or parser.items if section]}
+    if not result['sections']:
+        raise ResponseFormatError("無法解析回應為 JSON 格式")
+
+    # 只請模型補齊缺少欄位的章節，不重新產生整份架構
+    def repair(positions, problems):
+        sections = '\n\n'.join(
+            f"章節 {number}（{'、'.join(section_problems)}）：\n"
+            f"{json.dumps(result['sections'][position], ensure_ascii=False)}"
+            for number, (position, section_problems) in enumerate(zip(positions, problems), start=1)
+        )
+        response_text = complete_chat(
+            client,
+            refresh_cache=True,
+            step="repair_research_structure",
+            model="gpt-3.5-turbo",
+            messages=render_prompt('structure_repair', research_purpose=research_purpose, sections=sections),
+            temperature=0.3
+        )
+        groups = group_items_by_index(parse_json_items(response_text, 'sections') or [], len(positions))
+        return [group[0] if group else None for group in groups]
+
+    sections = validate_and_repair(result['sections'], SECTION_SCHEMA, repair, "analyze_research_purpose")
+    valid_sections = [section for section in sections if section is not None]
+    if not valid_sections:
+        raise ResponseFormatError("無法解析回應為 JSON 格式")
+    result['sections'] = valid_sections
+    if truncated or len(valid_sections) < len(sections):
+        result['truncated'] = True
+    return result
+
+def split_literature_entries(literature_texts):
+    """依空行將貼上的文字切分為逐篇文獻"""
+    entries = re.split(r'\n\s*\n', literature_texts.strip())
+    return [entry.strip() for entry in entries if entry.strip()]
+
+def pack_literature_batches(entries, max_tokens, max_entries, measure=count_tokens):
+    """依原順序將文獻打包成批次，每批不超過 token 上限與篇數上限（measure 計算單篇的 token 數）"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for entry in entries:
+        tokens = measure(entry)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_entries):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(entry)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+@engine_step("analyze_multiple_literature")
+def request_literature_analysis(section_title, entries, refresh_cache=False, problems=None):
+    """呼叫模型分析一批文獻，回傳依輸入順序分組的分析結果；完全無法解析回應時拋出 ResponseFormatError
+
+    problems 為各篇文獻先前回應的問題，提供時只重新請求這些文獻並附上修補說明。
+    """
+    messages = render_prompt(
+        'literature_analysis',
+        section_title=section_title,
+        literature_texts='\n\n'.join(f"文獻 {number}：{entry}" for number, entry in enumerate(entries, start=1))
+    )
+    response_text = complete_chat(
+        client,
+        refresh_cache=refresh_cache or problems is not None,
+        step="analyze_multiple_literature" if problems is None else "repair_multiple_literature",
+        validate=lambda text: parse_json_items(text, 'literature') is not None,
+        model="gpt-3.5-turbo",
+        messages=with_repair_note(messages, problems),
+        temperature=0.3
+    )
+    items = parse_json_items(response_text, 'literature')
+    if items is None:
+        raise ResponseFormatError("無法解析文獻分析結果")
+    groups = group_items_by_index(items, len(entries))
+    return [[{name: value for name, value in item.items() if name != 'index'} for item in group] for group in groups]
+
+def format_assessment_entry(number, record):
+    """將本機解析的文獻整理成評估提示詞中的一筆，摘要過長時裁切"""
+    abstract = truncate_to_tokens(record.get('abstract') or '', ASSESSMENT_ABSTRACT_MAX_TOKENS)
+    return f"文獻 {number}：{record['citation']}\n摘要：{abstract}"
+
+@engine_step("assess_literature")
+def request_literature_assessment(section_title, records, refresh_cache=False, problems=None):
+    """呼叫模型評估一批已在本機解析的文獻，只取得需要判斷的欄位，回傳依 index 對應的評估（缺少時為 None）
+
+    problems 為各篇文獻先前回應的問題，提供時只重新請求這些文獻並附上修補說明。
+    """
+    messages = render_prompt(
+        'literature_assessment',
+        section_title=section_title,
+        literature_list='\n\n'.join(
+            format_assessment_entry(number, record) for number, record in enumerate(records, start=1)
+        )
+    )
+    response_text = complete_chat(
+        client,
+        refresh_cache=refresh_cache or problems is not None,
+        step="assess_literature" if problems is None else "repair_assess_literature",
+        validate=lambda text: parse_json_items(text, 'assessments') is not None,
+        model="gpt-3.5-turbo",
+        messages=with_repair_note(messages, problems),
+        temperature=0.3
+    )
+    items = parse_json_items(response_text, 'assessments')
+    if items is None:
+        raise ResponseFormatError("無法解析文獻評估結果")
+    return [group[0] if group else None for group in group_items_by_index(items, len(records))]
+
+def retry_literature_request(request, section_title, batch, schema, step):
+    """執行一批文獻的模型請求並驗證每篇的結果，回傳依輸入順序的結果（修補後仍無效者為 None）
+
+    部分文獻的結果無效或缺少時只重新請求這幾篇；整份回應無法解析或請求失敗時才重試整批，並略過快取中無法使用的回應。
+    """
+    last_error = None
+    for attempt in range(LITERATURE_BATCH_RETRIES + 1):
+        try:
+            results = request(section_title, batch, refresh_cache=attempt > 0)
+        except Exception as e:
+            last_error = e
+            continue
+        return validate_and_repair(
+            results, schema,
+            lambda positions, problems: request(section_title, [batch[position] for position in positions], problems=problems),
+            step
+        )
+    raise last_error
+
+def analyze_literature_batch(section_title, entries):
+    """以模型完整分析一批文獻（擷取引用格式與摘要並評估），回傳每篇文獻的分析結果列表（失敗時為 None）"""
+    return retry_literature_request(
+        request_literature_analysis, section_title, entries, ListSchema(LITERATURE_SCHEMA), "analyze_multiple_literature"
+    )
+
+def assess_literature_batch(section_title, records):
+    """以模型評估一批已在本機解析的文獻，回傳合併評估後的文獻（失敗時為 None）"""
+    assessments = retry_literature_request(
+        request_literature_assessment, section_title, records, ASSESSMENT_SCHEMA, "assess_literature"
+    )
+    return [
+        None if assessment is None else dict(
+            record,
+            relevance=assessment['relevance'],
+            contribution=assessment['contribution'],
+            usage_suggestion=assessment['usage_suggestion']
+        )
+        for record, assessment in zip(records, assessments)
+    ]
+
+def describe_duplicate(citation, known, section_title, skipped):
+    """重複文獻的說明：引用格式、已出現的章節，以及是否略過（未略過表示沿用其他章節的分析）"""
+    return {'citation': citation, 'sections': known['sections'] if known else [section_title], 'skipped': skipped}
+
+@engine_step("analyze_multiple_literature")
+def request_multiple_literature(section_title, literature_texts, known_papers=None):
+    """依篇切分、分批並行分析多篇文獻，再依原順序合併
+
+    格式可在本機解析的文獻只請模型評估，其餘文獻交由模型完整分析。
+    known_papers 為 build_paper_index 建立的跨章節文獻索引：已在本章節的文獻與同一次貼上的重複文獻會略過，
+    已在其他章節分析過的文獻沿用引用格式與摘要，只請模型評估與本章節相關的欄位。
+    回傳 {'literature': 分析結果, 'failed_batches': 重試後仍失敗的批次, 'parsed_locally': 本機解析的篇數,
+    'reused': 沿用其他章節分析結果的篇數, 'duplicates': 重複的文獻}，失敗批次保留原文供使用者重新貼上。
+    """
+    known_papers = known_papers or {}
+    entries = split_literature_entries(literature_texts)
+    records = [parse_literature_entry(entry) if LITERATURE_LOCAL_PARSER else None for entry in entries]
+
+    # 以 DOI 或第一作者、年份與標題辨識重複的文獻
+    seen_keys = set()
+    duplicates = []
+    reused = 0
+    for index, entry in enumerate(entries):
+        key = paper_key(records[index]) if records[index] else entry_key(entry)
+        if key is None:
+            continue
+        known = known_papers.get(key)
+        citation = known['paper']['citation'] if known else entry.strip().splitlines()[0]
+        if key in seen_keys or (known and section_title in known['sections']):
+            duplicates.append(describe_duplicate(citation, known, section_title, skipped=True))
+            records[index] = False
+            continue
+        seen_keys.add(key)
+        if known:
+            # 與章節無關的欄位沿用先前的分析，不必再請模型擷取
+            records[index] = {field: known['paper'].get(field) for field in PAPER_FIELDS}
+            reused += 1
+            duplicates.append(describe_duplicate(citation, known, section_title, skipped=False))
+
+    parsed = [index for index, record in enumerate(records) if record]
+    unparsed = [index for index, record in enumerate(records) if record is None]
+    batches = [
+        ('assess', batch) for batch in pack_literature_batches(
+            parsed, LITERATURE_BATCH_TOKENS, ASSESSMENT_BATCH_SIZE,
+            measure=lambda index: count_tokens(format_assessment_entry(index, records[index]))
+        )
+    ] + [
+        ('analyze', batch) for batch in pack_literature_batches(
+            unparsed, LITERATURE_BATCH_TOKENS, LITERATURE_BATCH_SIZE,
+            measure=lambda index: count_tokens(entries[index])
+        )
+    ]
+
+    def run_batch(batch):
+        mode, indexes = batch
+        if mode == 'assess':
+            return assess_literature_batch(section_title, [records[index] for index in indexes])
+        return analyze_literature_batch(section_title, [entries[index] for index in indexes])
+
+    # 依每篇文獻的位置放回結果，合併時維持貼上的順序
+    results_by_entry = {}
+    failed_batches = []
+    results = map_concurrently(run_batch, batches, LITERATURE_CONCURRENCY)
+    for index, literature, error in results:
+        mode, indexes = batches[index]
+        if error is not None:
+            failed_batches.append({'index': index, 'error': str(error), 'entries': [entries[i] for i in indexes]})
+            continue
+        # 修補後仍無效的文獻保留原文，其餘文獻照常加入
+        invalid = [entry_index for entry_index, result in zip(indexes, literature) if result is None]
+        if invalid:
+            failed_batches.append({
+                'index': index,
+                'error': f"{len(invalid)} 篇文獻的分析結果格式不正確",
+                'entries': [entries[i] for i in invalid]
+            })
+        for entry_index, result in zip(indexes, literature):
+            if result is None:
+                continue
+            if mode == 'assess':
+                results_by_entry[entry_index] = [result]
+            else:
+                # 模型完整分析的文獻同樣補上作者、年份、標題與 DOI 欄位
+                results_by_entry[entry_index] = [dict(parse_citation(item.get('citation', '')), **item) for item in result]
+
+    # 模型完整分析後才能辨識的重複文獻（例如引用格式不在第一行）同樣略過
+    literature = []
+    result_keys = set()
+    for entry_index in sorted(results_by_entry):
+        for item in results_by_entry[entry_index]:
+            key = paper_key(item)
+            known = known_papers.get(key) if key else None
+            if key and (key in result_keys or (known and section_title in known['sections'])):
+                duplicates.append(describe_duplicate(item.get('citation', ''), known, section_title, skipped=True))
+                continue
+            if key:
+                result_keys.add(key)
+            literature.append(item)
+
+    return {
+        'literature': literature,
+        'failed_batches': sorted(failed_batches, key=lambda batch: batch['index']),
+        'parsed_locally': len(parsed) - reused,
+        'reused': reused,
+        'duplicates': duplicates
+    }
+
+def find_new_papers(review, literature_list):
+    """找出這份文獻探討尚未處理過的文獻（不在 included_papers 與 excluded_papers 中）"""
+    known = set(review.get('included_papers') or []) | set(review.get('excluded_papers') or [])
+    return [paper for paper in literature_list if paper_identity(paper) not in known]
+
+def track_review_papers(review, candidates, packed, mode):
+    """記錄新版本納入的文獻，以及這次考慮過但依相關程度或 token 預算未納入的文獻
+
+    review 為前一版（第一次產生時為 None）；history 依版本記錄每一版新增的文獻識別鍵。
+    """
+    review = review or {}
+    added = [paper_identity(paper) for paper in packed.included]
+    excluded = []
+    for paper in candidates:
+        key = paper_identity(paper)
+        if key and key not in added and key not in excluded:
+            excluded.append(key)
+    version = review.get('version', 0) + 1
+    return {
+        'included_papers': review.get('included_papers', []) + added,
+        'excluded_papers': review.get('excluded_papers', []) + excluded,
+        'version': version,
+        'history': review.get('history', []) + [{'version': version, 'mode': mode, 'added_papers': added}]
+    }
+
+@engine_step("generate_literature_review")
+def request_literature_review(section_title, literature_list, stream_container=None, section=None):
+    """呼叫模型產生文獻探討內容（提供 stream_container 時即時串流顯示）
+
+    section 為文獻探討架構中的章節（重點說明、小標題與搜尋字串）；文獻超過 REVIEW_TOP_K 篇時，
+    依與章節的相關程度只選出前 REVIEW_TOP_K 篇，回傳值的 literature_used 記錄實際使用的篇數。
+    文獻資料依相關程度打包到 REVIEW_LITERATURE_MAX_TOKENS 內，打包報告記錄在 context；
+    納入的文獻記錄在 included_papers，之後新增的文獻可用 request_literature_review_update 增量更新。
+    """
+    # 排序需要 NumPy，第一次產生文獻探討時才匯入，不影響頁面的啟動時間
+    from relevance_ranker import select_top_papers
+    selected = select_top_papers(section or {'title_zh': section_title}, literature_list, REVIEW_TOP_K)
+    packed = pack_literature(selected, REVIEW_LITERATURE_MAX_TOKENS)
+
+    response_text = complete_chat_streamed(
+        client,
+        stream_container,
+        step="generate_literature_review",
+        validate=lambda text: has_content_and_references(text, '===文獻探討==='),
+        model="gpt-3.5-turbo",
+        messages=render_prompt(
+            'literature_review',
+            section_title=section_title,
+            literature_data=packed.text
+        ),
+        temperature=0.7,
+        max_tokens=3000
+    )
+    content = response_text.strip()
+    
+    # 分割內容和參考文獻
+    review_content, references = split_content_and_references(content, '===文獻探討===')
+    
+    return {
+        'content': review_content,
+        'references': references,
+        'literature_used': packed.report['included'],
+        'literature_total': len(literature_list),
+        'context': packed.report,
+        **track_review_papers(None, literature_list, packed, 'full')
+    }
+
+@engine_step("update_literature_review")
+def request_literature_review_update(section_title, review, literature_list, stream_container=None, section=None):
+    """只把尚未納入的新文獻整合進現有的文獻探討，回傳修訂後的新版本（格式與 request_literature_review 相同）
+
+    提示詞只包含現有的文獻探討、參考文獻與新文獻，不重新送出已納入的文獻；
+    參考文獻為現有列表與模型回覆的列表合併後去除重複。沒有新文獻時直接回傳原本的 review。
+    """
+    new_papers = find_new_papers(review, literature_list)
+    if not new_papers:
+        return review
+    from relevance_ranker import select_top_papers
+    selected = select_top_papers(section or {'title_zh': section_title}, new_papers, REVIEW_TOP_K)
+    packed = pack_literature(selected, REVIEW_LITERATURE_MAX_TOKENS)
+
+    response_text = complete_chat_streamed(
+        client,
+        stream_container,
+        step="update_literature_review",
+        validate=lambda text: has_content_and_references(text, '===文獻探討==='),
+        model="gpt-3.5-turbo",
+        messages=render_prompt(
+            'literature_review_update',
+            section_title=section_title,
+            current_review=review['content'],
+            current_references=review['references'],
+            literature_data=packed.text
+        ),
+        temperature=0.7,
+        max_tokens=3000
+    )
+    review_content, references = split_content_and_references(response_text.strip(), '===文獻探討===')
+    tracked = track_review_papers(review, new_papers, packed, 'incremental')
+    return {
+        'content': review_content,
+        'references': merge_references([review['references'], references]),
+        'literature_used': len(tracked['included_papers']),
+        'literature_total': len(literature_list),
+        'context': packed.report,
+        **tracked
+    }
+
+def request_all_literature_reviews(jobs, max_workers, progress_container=None, on_review=None):
+    """並行產生多個章節的文獻探討，單一章節失敗不影響其他章節
+
+    jobs 為 (章節標題, 文獻列表, 章節) 的列表；回傳 {'reviews': 各章節結果, 'failures': 各章節錯誤訊息}。
+    提供 on_review 時，每個章節完成後立即以 on_review(章節標題, 結果) 回報，不必等待其他章節。
+    """
+    reviews = {}
+    failures = {}
+    status = {title: f"⏳ 「{title}」：產生中（{len(literature_list)} 篇文獻）..." for title, literature_list, _ in jobs}
+    results = map_concurrently(
+        lambda job: request_literature_review(job[0], job[1], section=job[2]), jobs, max_workers
+    )
+    for completed, (index, review_result, error) in enumerate(results, start=1):
+        title = jobs[index][0]
+        if error is not None:
+            failures[title] = str(error)
+            status[title] = f"❌ 「{title}」：產生失敗（{str(error)}）"
+        else:
+            reviews[title] = review_result
+            status[title] = f"✅ 「{title}」：已完成"
+            if on_review is not None:
+                on_review(title, review_result)
+        if progress_container is not None:
+            progress_container.markdown(
+                f"**已完成 {completed}/{len(jobs)} 個章節**\n\n" + '\n\n'.join(status.values())
+            )
+    return {'reviews': reviews, 'failures': failures}
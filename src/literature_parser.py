@@ -0,0 +1,103 @@
+import re
+
+# 不需要呼叫模型，直接由貼上的 SciSpace／APA 文字解析出引用格式、作者、年份、標題、DOI 與摘要。
+# 只處理有把握的格式；無法確定的文獻回傳 None，交由模型分析。
+
+# 摘要至少需要的字元數，太短可能是切分錯誤或只有引用格式
+MIN_ABSTRACT_CHARS = 10
+
+DOI_PATTERN = re.compile(r'\b(10\.\d{4,9}/[^\s"<>]+)', re.I)
+DOI_PREFIX_PATTERN = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.I)
+
+# 英文 APA：Author, A. B., & Author, C. (2020). Title of the work. Source, 4(1), 5-18.
+APA_EN_PATTERN = re.compile(
+    r'^(?P<authors>[^()]+?)\s*\((?P<year>\d{4})[a-z]?(?:,[^)]*)?\)\.\s*'
+    r'(?P<title>.+?[.?!])(?:\s+(?P<source>.*))?$'
+)
+# 中文 APA：王小明、李大華（2020）。標題。期刊，25（2），1-20。
+APA_ZH_PATTERN = re.compile(
+    r'^(?P<authors>[^（()]+?)\s*[（(](?P<year>\d{4})[a-z]?[）)]\s*[。.]\s*'
+    r'(?P<title>[^。]+)。(?P<source>.*)$'
+)
+EN_AUTHOR_PATTERN = re.compile(r"([A-Z][\w'’\-]*(?:\s+[A-Z][\w'’\-]*)*),\s*((?:[A-Z]\.\s*-?\s*)+)")
+ZH_AUTHOR_SEPARATOR = re.compile(r'[、，,]|與|和')
+
+# SciSpace 複製內容中常見、不屬於摘要的標籤
+ABSTRACT_LABEL_PATTERN = re.compile(r'^(?:abstract|摘要|summary|tl;?dr)\s*[:：]\s*', re.I)
+
+
+def _find_citation_line(lines):
+    """找出第一行符合 APA 格式的引用，回傳 (索引, 解析結果)"""
+    for index, line in enumerate(lines[:3]):
+        for pattern, language in ((APA_EN_PATTERN, 'en'), (APA_ZH_PATTERN, 'zh')):
+            match = pattern.match(line)
+            if match:
+                return index, match, language
+    return None, None, None
+
+
+def _parse_authors(text, language):
+    if language == 'zh':
+        text = re.sub(r'等人?$', '', text.strip())
+        return [name.strip() for name in ZH_AUTHOR_SEPARATOR.split(text) if name.strip()]
+    authors = [f"{surname}, {' '.join(initials.split())}" for surname, initials in EN_AUTHOR_PATTERN.findall(text)]
+    if not authors and text.strip():
+        # 機構作者（例如 World Health Organization）
+        authors = [text.strip().rstrip('.')]
+    return authors
+
+
+def find_doi(text):
+    match = DOI_PATTERN.search(text)
+    return match.group(1).rstrip('.,;)') if match else ''
+
+
+def parse_citation(citation):
+    """解析單行 APA 引用格式，回傳 {authors, year, title, doi}；無法解析時各欄位為空值"""
+    for pattern, language in ((APA_EN_PATTERN, 'en'), (APA_ZH_PATTERN, 'zh')):
+        match = pattern.match(citation.strip())
+        if match:
+            return {
+                'authors': _parse_authors(match.group('authors'), language),
+                'year': match.group('year'),
+                'title': match.group('title').strip().rstrip('.'),
+                'doi': find_doi(citation)
+            }
+    return {'authors': [], 'year': '', 'title': '', 'doi': find_doi(citation)}
+
+
+def parse_literature_entry(text):
+    """解析單篇文獻，回傳 {citation, abstract, authors, year, title, doi}；格式無法確定時回傳 None"""
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    if len(lines) < 2:
+        return None
+    index, match, language = _find_citation_line(lines)
+    if match is None:
+        return None
+
+    citation = lines[index]
+    title = match.group('title').strip().rstrip('.')
+    authors = _parse_authors(match.group('authors'), language)
+    if not authors or len(title) < 3:
+        return None
+
+    # 引用格式之後的內容視為摘要；之前的行（例如 SciSpace 的標題列）捨棄，DOI 單獨一行時也不算摘要
+    doi = find_doi(citation)
+    abstract_lines = []
+    for line in lines[index + 1:]:
+        if DOI_PATTERN.fullmatch(DOI_PREFIX_PATTERN.sub('', line)):
+            doi = doi or find_doi(line)
+            continue
+        abstract_lines.append(ABSTRACT_LABEL_PATTERN.sub('', line))
+    abstract = ' '.join(line for line in abstract_lines if line)
+    if len(abstract) < MIN_ABSTRACT_CHARS:
+        return None
+
+    return {
+        'citation': citation,
+        'abstract': abstract,
+        'authors': authors,
+        'year': match.group('year'),
+        'title': title,
+        'doi': doi
+    }
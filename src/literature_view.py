@@ -0,0 +1,90 @@
+import math
+import os
+import re
+
+import streamlit as st
+
+# 已收集文獻的分頁顯示：每次重新執行只把目前這一頁的文獻送到瀏覽器，
+# 文獻很多時（例如五個章節共上百篇）不必每次點按鈕都重新傳送全部內容。
+
+# 每頁顯示的文獻篇數
+LITERATURE_PAGE_SIZE = int(os.getenv('LITERATURE_PAGE_SIZE', '10'))
+
+# 搜尋的欄位：引用格式、摘要（逐筆新增的文獻使用 summary 欄位）與年份
+SEARCH_FIELDS = ('citation', 'abstract', 'summary', 'year')
+
+YEAR_PATTERN = re.compile(r'[（(](\d{4})[a-z]?[,，）)]')
+
+
+def _search_text(item):
+    year = item.get('year') or ''
+    if not year:
+        match = YEAR_PATTERN.search(item.get('citation') or '')
+        year = match.group(1) if match else ''
+    values = [str(item.get(field) or '') for field in SEARCH_FIELDS if field != 'year']
+    return '\n'.join(values + [str(year)]).casefold()
+
+
+def filter_literature(literature, query):
+    """依搜尋字串篩選文獻，回傳 [(原本的索引, 文獻)]；以空白分隔的每個關鍵字都需符合"""
+    terms = query.casefold().split()
+    if not terms:
+        return list(enumerate(literature))
+    return [
+        (index, item) for index, item in enumerate(literature)
+        if all(term in _search_text(item) for term in terms)
+    ]
+
+
+def paginate(items, page, page_size):
+    """取出第 page 頁（從 1 開始）的項目，回傳 (該頁項目, 總頁數)"""
+    pages = max(1, math.ceil(len(items) / page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], pages
+
+
+def render_literature_page(literature, key, render_item, page_size=None):
+    """顯示搜尋框與分頁控制，只呈現符合條件的目前這一頁文獻
+
+    render_item(number, item) 負責顯示單篇文獻，number 為文獻在章節中的編號（從 1 開始）。
+    """
+    page_size = page_size or LITERATURE_PAGE_SIZE
+    query = st.text_input(
+        "搜尋文獻（引用格式、摘要或年份）",
+        key=f"{key}_query",
+        placeholder="例如：design thinking 2020"
+    )
+    matches = filter_literature(literature, query)
+
+    # 搜尋條件改變時回到第一頁
+    page_key = f"{key}_page"
+    if st.session_state.get(f"{key}_last_query") != query:
+        st.session_state[f"{key}_last_query"] = query
+        st.session_state[page_key] = 1
+    pages = max(1, math.ceil(len(matches) / page_size))
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("頁數", min_value=1, max_value=pages, step=1, key=page_key) if pages > 1 else 1
+    visible, pages = paginate(matches, int(page), page_size)
+    with col2:
+        if query.strip():
+            st.caption(f"共 {len(literature)} 篇，符合搜尋條件 {len(matches)} 篇，第 {int(page)} / {pages} 頁")
+        else:
+            st.caption(f"共 {len(literature)} 篇，第 {int(page)} / {pages} 頁")
+
+    if not matches:
+        st.info("沒有符合搜尋條件的文獻")
+    for index, item in visible:
+        render_item(index + 1, item)
+
+
+def render_section_totals(container, totals):
+    """顯示各章節已收集的文獻篇數；totals 為 [(章節名稱, 篇數)]"""
+    expander = container.expander("📊 各章節文獻數量", expanded=False)
+    for title, count in totals:
+        expander.caption(f"{title}：{count} 篇")
+    expander.caption(f"合計：{sum(count for _, count in totals)} 篇")
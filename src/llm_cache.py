@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 快取鍵的格式版本，調整鍵的組成方式時遞增以避免讀到舊資料
+CACHE_KEY_VERSION = 1
+
+# 參與快取鍵計算的參數（模型、訊息與取樣參數）
+CACHE_KEY_PARAMS = (
+    'model', 'messages', 'temperature', 'top_p', 'max_tokens', 'n',
+    'presence_penalty', 'frequency_penalty', 'stop', 'seed', 'response_format'
+)
+
+
+def make_cache_key(params):
+    """依模型、訊息與取樣參數計算內容定址的快取鍵（SHA-256）"""
+    key_data = {name: params[name] for name in CACHE_KEY_PARAMS if params.get(name) is not None}
+    key_data['_version'] = CACHE_KEY_VERSION
+    canonical = json.dumps(key_data, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """LLM 回應快取：記憶體 LRU 搭配 SQLite 磁碟儲存，支援 TTL 與容量上限"""
+
+    def __init__(self, path=None, max_entries=256, max_bytes=16 * 1024 * 1024,
+                 max_disk_entries=5000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        if path:
+            self._open_disk_store(path)
+
+    def _open_disk_store(self, path):
+        """開啟（或建立）磁碟快取資料庫"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+
+    def _is_expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def _remember(self, key, value, created_at):
+        """寫入記憶體 LRU，並依筆數與位元組上限淘汰最久未使用的項目"""
+        size = len(value.encode('utf-8'))
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[2]
+        self._memory[key] = (value, created_at, size)
+        self._memory_bytes += size
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.stats['evictions'] += 1
+
+    def get(self, key):
+        """讀取快取內容；過期或不存在時回傳 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at, _ = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return value
+                self._memory_bytes -= self._memory.pop(key)[2]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    'SELECT value, created_at FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._is_expired(created_at, now):
+                        self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+                        self._remember(key, value, created_at)
+                        self.stats['disk_hits'] += 1
+                        return value
+                    self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        """寫入快取（記憶體與磁碟）"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats['writes'] += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, value, now, now)
+                )
+                self._evict_disk(now)
+
+    def _evict_disk(self, now):
+        """刪除過期項目，並在超過筆數上限時淘汰最久未讀取的項目"""
+        if self.ttl is not None:
+            self._conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+        count = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)',
+                (overflow,)
+            )
+            self.stats['evictions'] += overflow
+
+    def clear(self):
+        """清除所有快取內容"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM responses')
+
+    def get_stats(self):
+        """取得快取命中統計"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """取得程序共用的 LLM 回應快取（依環境變數設定）"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                path = os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_cache.sqlite3'))
+                ttl_hours = float(os.getenv('LLM_CACHE_TTL_HOURS', '168'))
+                _default_cache = LLMCache(
+                    path=path or None,
+                    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '256')),
+                    max_disk_entries=int(os.getenv('LLM_CACHE_MAX_DISK_ENTRIES', '5000')),
+                    ttl=ttl_hours * 3600 if ttl_hours > 0 else None
+                )
+    return _default_cache
@@ -0,0 +1,125 @@
+import os
+
+from llm_cache import get_default_cache, make_cache_key
+from rate_limiter import call_with_rate_limit, get_rate_limiter
+from token_budget import DEFAULT_OUTPUT_RESERVE, TokenBudgetError, count_tokens, fit_messages_to_budget, record_usage
+
+# 是否啟用 LLM 回應快取（可用環境變數關閉）
+CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+
+def _prepare_request(params, step):
+    """呼叫前先計算提示詞 token 數，超過模型上下文時裁切或拒絕"""
+    try:
+        messages, prompt_tokens, trimmed = fit_messages_to_budget(
+            params['messages'], params.get('model'), params.get('max_tokens')
+        )
+    except TokenBudgetError:
+        record_usage(step, rejected=True)
+        raise
+    return dict(params, messages=messages), prompt_tokens, trimmed
+
+
+def _create(client, estimated_tokens, **params):
+    """經由共用速率限制器呼叫 chat.completions.create；重試由限制器負責，因此關閉客戶端本身的重試"""
+    return call_with_rate_limit(
+        lambda: client.with_options(max_retries=0).chat.completions.create(**params),
+        estimated_tokens
+    )
+
+
+def _estimate_tokens(params, prompt_tokens):
+    # 排隊時以提示詞加上輸出上限預估用量，收到回應後再歸還差額
+    return prompt_tokens + (params.get('max_tokens') or DEFAULT_OUTPUT_RESERVE)
+
+
+def _is_usable(validate, content):
+    """validate 為呼叫端判斷回應可否使用的函式；未提供時任何回應都可使用"""
+    if validate is None:
+        return True
+    try:
+        return bool(validate(content))
+    except Exception:
+        return False
+
+
+def _read_cache(cache, key, refresh_cache, validate):
+    """讀取快取中可使用的回應；先前寫入但呼叫端無法使用的回應視為未命中，重新呼叫後覆寫"""
+    if not cache or refresh_cache:
+        return None
+    cached = cache.get(key)
+    return cached if cached is not None and _is_usable(validate, cached) else None
+
+
+def complete_chat(client, use_cache=True, refresh_cache=False, step=None, validate=None, **params):
+    """呼叫 chat.completions.create 並回傳回應文字；相同模型、訊息與參數的請求直接由快取回傳
+
+    refresh_cache=True 時略過快取讀取並以新的回應覆寫（用於重試先前無法解析的回應）。
+    提供 validate 時只快取 validate(回應文字) 為真的回應，無法解析的回應不會在重試時重複回傳。
+    step 為記錄 token 用量時使用的步驟名稱。
+    """
+    params, prompt_tokens, trimmed = _prepare_request(params, step)
+    cache = get_default_cache() if (use_cache and CACHE_ENABLED) else None
+    key = make_cache_key(params) if cache else None
+
+    cached = _read_cache(cache, key, refresh_cache, validate)
+    if cached is not None:
+        record_usage(step, cached=True, trimmed=trimmed)
+        return cached
+
+    estimated_tokens = _estimate_tokens(params, prompt_tokens)
+    response = _create(client, estimated_tokens, **params)
+    content = response.choices[0].message.content or ''
+
+    usage = getattr(response, 'usage', None)
+    used_prompt_tokens = usage.prompt_tokens if usage else prompt_tokens
+    completion_tokens = usage.completion_tokens if usage else count_tokens(content, params.get('model'))
+    get_rate_limiter().refund(estimated_tokens - used_prompt_tokens - completion_tokens)
+    record_usage(
+        step,
+        prompt_tokens=used_prompt_tokens,
+        completion_tokens=completion_tokens,
+        trimmed=trimmed
+    )
+    if cache and _is_usable(validate, content):
+        cache.set(key, content)
+    return content
+
+
+def stream_chat(client, use_cache=True, refresh_cache=False, step=None, validate=None, **params):
+    """以串流方式呼叫 chat.completions.create，逐段產生回應文字；完整收到且 validate 通過後才寫入快取，用量在任何結束方式下都會記錄"""
+    params, prompt_tokens, trimmed = _prepare_request(params, step)
+    cache = get_default_cache() if (use_cache and CACHE_ENABLED) else None
+    key = make_cache_key(params) if cache else None
+
+    cached = _read_cache(cache, key, refresh_cache, validate)
+    if cached is not None:
+        record_usage(step, cached=True, trimmed=trimmed)
+        yield cached
+        return
+
+    estimated_tokens = _estimate_tokens(params, prompt_tokens)
+    stream = _create(client, estimated_tokens, stream=True, **params)
+    parts = []
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        # 串流中途出錯或呼叫端提前停止讀取時，仍以目前收到的內容歸還預估差額並記錄用量
+        completion_tokens = count_tokens(''.join(parts), params.get('model'))
+        get_rate_limiter().refund(estimated_tokens - prompt_tokens - completion_tokens)
+        record_usage(
+            step,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            trimmed=trimmed
+        )
+
+    content = ''.join(parts)
+    if cache and _is_usable(validate, content):
+        cache.set(key, content)
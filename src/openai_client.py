@@ -0,0 +1,118 @@
+import importlib.util
+import os
+import threading
+import time
+
+import httpx
+
+# openai 套件匯入約需 0.7 秒，延後到第一次建立客戶端時才匯入，頁面首次顯示不必等待
+
+# 連線逾時設定（秒）：建立連線、讀取（兩段資料之間的最長間隔）、寫入、等待連線池，以及整個請求的總時限
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '10'))
+OPENAI_READ_TIMEOUT = float(os.getenv('OPENAI_READ_TIMEOUT', '120'))
+OPENAI_WRITE_TIMEOUT = float(os.getenv('OPENAI_WRITE_TIMEOUT', '30'))
+OPENAI_POOL_TIMEOUT = float(os.getenv('OPENAI_POOL_TIMEOUT', '30'))
+OPENAI_TOTAL_TIMEOUT = float(os.getenv('OPENAI_TOTAL_TIMEOUT', '600'))
+
+# 連線池設定：最大連線數、保持連線（keep-alive）的連線數與閒置秒數，以及是否啟用 HTTP/2
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '50'))
+OPENAI_MAX_KEEPALIVE = int(os.getenv('OPENAI_MAX_KEEPALIVE', '20'))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '120'))
+OPENAI_HTTP2 = os.getenv('OPENAI_HTTP2', 'false').lower() in ('1', 'true', 'yes')
+
+
+class _DeadlineStream(httpx.SyncByteStream):
+    """讀取回應內容時檢查整體時限，避免緩慢但持續有資料的回應超過總時限"""
+
+    def __init__(self, stream, request, deadline):
+        self._stream = stream
+        self._request = request
+        self._deadline = deadline
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if time.monotonic() > self._deadline:
+                raise httpx.ReadTimeout('超過請求的總時限', request=self._request)
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+
+
+class DeadlineTransport(httpx.HTTPTransport):
+    """在 httpx 的分段逾時之外，再加上整個請求（含串流回應）的總時限"""
+
+    def __init__(self, total_timeout=None, **kwargs):
+        super().__init__(**kwargs)
+        self.total_timeout = total_timeout
+
+    def handle_request(self, request):
+        if not self.total_timeout:
+            return super().handle_request(request)
+        deadline = time.monotonic() + self.total_timeout
+        # 各階段的逾時也不超過總時限，等待回應標頭時同樣受到限制
+        timeouts = request.extensions.get('timeout', {})
+        request.extensions['timeout'] = {
+            name: min(value, self.total_timeout) if value is not None else self.total_timeout
+            for name, value in timeouts.items()
+        }
+        response = super().handle_request(request)
+        if time.monotonic() > deadline:
+            response.close()
+            raise httpx.ReadTimeout('超過請求的總時限', request=request)
+        response.stream = _DeadlineStream(response.stream, request, deadline)
+        return response
+
+
+def build_http_client(http2=None):
+    """建立共用連線池的 HTTP 客戶端；要求 HTTP/2 但未安裝 h2（httpx[http2]）時退回 HTTP/1.1"""
+    from openai import DefaultHttpxClient
+
+    http2 = OPENAI_HTTP2 if http2 is None else http2
+    transport = DeadlineTransport(
+        total_timeout=OPENAI_TOTAL_TIMEOUT,
+        http2=bool(http2 and importlib.util.find_spec('h2') is not None),
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+        )
+    )
+    return DefaultHttpxClient(
+        transport=transport,
+        timeout=httpx.Timeout(
+            connect=OPENAI_CONNECT_TIMEOUT,
+            read=OPENAI_READ_TIMEOUT,
+            write=OPENAI_WRITE_TIMEOUT,
+            pool=OPENAI_POOL_TIMEOUT
+        )
+    )
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """取得程序共用的 OpenAI 客戶端；所有頁面與 session 共用同一個連線池，重複使用已建立的 TLS 連線"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                from openai import OpenAI
+
+                _default_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=build_http_client())
+    return _default_client
+
+
+class LazyOpenAIClient:
+    """代理程序共用的 OpenAI 客戶端，第一次呼叫 API 時才建立（並匯入 openai 套件）
+
+    以是否設定 OPENAI_API_KEY 判斷真假值，頁面可在不建立客戶端的情況下檢查金鑰。
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_openai_client(), name)
+
+    def __bool__(self):
+        return bool(os.getenv("OPENAI_API_KEY"))
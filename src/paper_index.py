@@ -0,0 +1,75 @@
+import re
+import unicodedata
+
+from literature_parser import find_doi, parse_citation
+
+# 跨章節的文獻索引：以 DOI（或第一作者、年份與標題）辨識同一篇文獻，
+# 讓重複貼到不同章節的文獻可以沿用先前擷取的引用格式與摘要，只重新評估與新章節相關的欄位。
+
+# 與章節無關、可以跨章節沿用的欄位
+PAPER_FIELDS = ('citation', 'abstract', 'authors', 'year', 'title', 'doi')
+
+DOI_PREFIX_PATTERN = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.I)
+NON_WORD_PATTERN = re.compile(r'[\W_]+', re.U)
+
+
+def _normalize_text(text):
+    # 全形轉半形、統一大小寫並移除標點與空白
+    return NON_WORD_PATTERN.sub('', unicodedata.normalize('NFKC', text or '').casefold())
+
+
+def _first_author_surname(authors):
+    if not authors:
+        return ''
+    return _normalize_text(authors[0].split(',')[0])
+
+
+def paper_key(record):
+    """取得文獻的識別鍵：有 DOI 時使用 DOI，否則使用第一作者姓氏、年份與標題；資訊不足時回傳 None"""
+    if not (record.get('authors') or record.get('doi')) and record.get('citation'):
+        # 模型分析的舊資料沒有結構化欄位時，由引用格式解析
+        parsed = parse_citation(record['citation'])
+        record = dict(parsed, **{name: value for name, value in record.items() if value})
+    doi = DOI_PREFIX_PATTERN.sub('', (record.get('doi') or '').strip()).casefold()
+    if doi:
+        return f"doi:{doi}"
+    surname = _first_author_surname(record.get('authors'))
+    title = _normalize_text(record.get('title'))
+    year = str(record.get('year') or '')
+    if surname and year and title:
+        return f"paper:{surname}|{year}|{title}"
+    return None
+
+
+def paper_identity(record):
+    """文獻的識別字串：優先使用 paper_key，資訊不足時以正規化的引用格式（沒有引用格式時以摘要）代替"""
+    return (
+        paper_key(record)
+        or _normalize_text(record.get('citation'))
+        or _normalize_text(record.get('abstract') or record.get('summary'))
+        or None
+    )
+
+
+def entry_key(text):
+    """由尚未分析的貼上文字推測識別鍵（第一行是引用格式或內文含有 DOI 時）"""
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    if not lines:
+        return None
+    record = parse_citation(lines[0])
+    record['doi'] = record['doi'] or find_doi(text)
+    return paper_key(record)
+
+
+def build_paper_index(literature_data):
+    """由各章節已收集的文獻建立索引：{識別鍵: {'paper': 與章節無關的欄位, 'sections': 出現的章節}}"""
+    index = {}
+    for section_title, data in literature_data.items():
+        for item in data.get('literature', []):
+            key = paper_key(item)
+            if key is None:
+                continue
+            entry = index.setdefault(key, {'paper': {field: item.get(field) for field in PAPER_FIELDS}, 'sections': []})
+            if section_title not in entry['sections']:
+                entry['sections'].append(section_title)
+    return index
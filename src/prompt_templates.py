@@ -0,0 +1,745 @@
+# 提示詞樣板登錄表
+#
+# 所有提示詞集中在此定義並於匯入時編譯一次。每個樣板依「固定內容在前、變動內容在後」排列：
+# 系統訊息與使用者訊息開頭的指示都是固定文字，研究主題、文獻等變動資料一律放在使用者訊息結尾；
+# 撰寫中文內容的樣板中，固定前綴達到服務端快取門檻的共用同一段台灣用語規範作為開頭，讓提示詞快取（prompt caching）可以命中；
+# 未達門檻的樣板快取不會生效，完整規範只會增加每次呼叫的 token 數，改用簡短的用語提醒。
+from dataclasses import dataclass, field
+
+from token_budget import count_tokens
+
+# 服務端提示詞快取生效所需的最短前綴長度（tokens）
+PROVIDER_CACHE_MIN_TOKENS = 1024
+
+# 所有撰寫中文內容的樣板共用的開頭，必須逐字相同才能命中快取
+TAIWAN_STYLE_GUIDE = """請使用台灣繁體中文撰寫，並遵循以下用語規範：
+
+1. 使用台灣的設計研究用語：
+   - 「設計思考」而非「设计思维」
+   - 「使用者經驗」而非「用户体验」
+   - 「介面設計」而非「界面设计」
+   - 「互動設計」而非「交互设计」
+   - 「設計方法」而非「设计方法论」
+   - 「設計實務」而非「设计实践」
+
+2. 使用台灣的專業術語：
+   - 「使用者」而非「用户」
+   - 「介面」而非「界面」
+   - 「互動」而非「交互」
+   - 「設計流程」而非「设计流程」
+   - 「設計策略」而非「设计策略」
+
+3. 使用台灣的表達方式：
+   - 「目前」而非「当前」
+   - 「之後」而非「之后」
+   - 「因此」而非「所以」
+   - 「然而」而非「但是」
+   - 「藉由」而非「通过」
+   - 「根據」而非「按照」
+
+4. 使用台灣的學術用語：
+   - 「研究」而非「研讨」
+   - 「方法」而非「方式」
+   - 「探討」而非「探讨」
+   - 「實施」而非「实行」
+   - 「成效」而非「成果」
+
+5. 標點符號使用：
+   - 使用「」作為中文引號
+   - 使用『』作為引號中的引號
+   - 書名號使用《》
+   - 篇名號使用〈〉
+   - 避免使用中國大陸的用語習慣"""
+
+# 固定前綴未達 PROVIDER_CACHE_MIN_TOKENS 的樣板使用的簡短用語提醒
+TAIWAN_STYLE_NOTE = """請使用台灣繁體中文的用字習慣撰寫內容，注意：
+- 使用台灣的學術用語和專業術語
+- 使用台灣的標點符號習慣（如：使用「」引號）
+- 使用台灣的語氣詞和表達方式
+- 避免使用中國大陸的用語習慣"""
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """提示詞樣板：固定的系統訊息與指示，加上放在使用者訊息結尾的變動內容"""
+    name: str
+    system: str
+    instructions: str
+    variables: str
+    shared_prefix: str = ''
+    _compiled: dict = field(default_factory=dict, compare=False, repr=False)
+
+    def __post_init__(self):
+        # 編譯一次：預先組好固定的系統訊息與使用者訊息開頭
+        system = f"{self.shared_prefix}\n\n{self.system}" if self.shared_prefix else self.system
+        self._compiled['system'] = system
+        self._compiled['user_prefix'] = self.instructions + '\n\n'
+
+    def render(self, **values):
+        """代入變動內容，回傳 chat 訊息列表"""
+        return [
+            {"role": "system", "content": self._compiled['system']},
+            {"role": "user", "content": self._compiled['user_prefix'] + self.variables.format(**values)}
+        ]
+
+    def size(self, model='gpt-3.5-turbo'):
+        """計算樣板固定部分的 token 數"""
+        system_tokens = count_tokens(self._compiled['system'], model)
+        instruction_tokens = count_tokens(self._compiled['user_prefix'], model)
+        return {
+            'name': self.name,
+            'shared_prefix_tokens': count_tokens(self.shared_prefix, model),
+            'system_tokens': system_tokens,
+            'instruction_tokens': instruction_tokens,
+            'static_tokens': system_tokens + instruction_tokens,
+            'cacheable': system_tokens + instruction_tokens >= PROVIDER_CACHE_MIN_TOKENS
+        }
+
+
+PROMPTS = {}
+
+# 結構化輸出中部分項目無效時，附加在原本訊息之後的修補說明（只重新請求這些項目）
+REPAIR_NOTE = """【格式修正】先前的回應中，下列項目缺少欄位或格式不正確：
+{problems}
+
+請只針對上方列出的項目重新完整回覆，每一筆都必須包含格式中的所有欄位，並只回傳 JSON。"""
+
+
+def register(template):
+    """登錄提示詞樣板"""
+    PROMPTS[template.name] = template
+    return template
+
+
+def render_prompt(name, **values):
+    """以登錄的樣板產生 chat 訊息列表"""
+    return PROMPTS[name].render(**values)
+
+
+def prompt_size_report(model='gpt-3.5-turbo'):
+    """回報每個樣板固定部分的大小，以及是否達到服務端快取的最短長度"""
+    return [template.size(model) for template in PROMPTS.values()]
+
+
+register(PromptTemplate(
+    name='keywords',
+    system="""你是一個專業的設計研究助手，專門負責從研究主題和內容中提取核心關鍵字。
+
+規則：
+1. 只回傳關鍵字清單，每行一個關鍵字
+2. 每個關鍵字必須包含中英文對照，使用 / 分隔
+3. 不要包含任何其他說明文字或標點符號
+4. 關鍵字應該要能反映研究的核心概念
+5. 英文關鍵字使用學術資料庫常見的用詞
+6. 每個關鍵字的格式必須是：中文關鍵字 / English Keyword
+7. 總數限制在 5-7 個最重要的關鍵字
+
+範例格式：
+設計思考 / Design Thinking
+使用者經驗 / User Experience
+介面設計 / Interface Design""",
+    instructions="請從以下研究主題和內容中提取最核心的關鍵字（中英對照）：",
+    variables="研究主題：{topic}\n\n研究內容：{content}"
+))
+
+register(PromptTemplate(
+    name='search_query',
+    system="You are a research assistant helping to create academic search queries. Create natural, complete English sentences that would be effective for academic database searches.",
+    instructions="Create a comprehensive academic search query using the keywords below. The query should be a complete English sentence suitable for academic database searches.",
+    variables="Keywords: {keywords}"
+))
+
+register(PromptTemplate(
+    name='titles',
+    shared_prefix=TAIWAN_STYLE_GUIDE,
+    system="""你是一位深耕於設計研究領域的專業學術研究者，擅長整合設計理論與實務。
+
+研究題目命名原則：
+   - 清楚表達研究主題
+   - 點出研究方法或途徑
+   - 說明研究對象或範圍
+   - 展現研究的創新性
+   - 符合學術寫作規範""",
+    instructions="""請根據文末提供的研究主題、研究內容與文獻資料，生成三個符合學術規範的研究題目選項。請特別注意整合所有提供的資訊，確保題目緊密連結研究主題與內容。
+
+【題目生成要求】
+
+1. 資料整合原則：
+   - 完整分析研究主題的核心問題
+   - 參考研究內容規劃的方向
+   - 整合文獻資料的理論基礎
+   - 確保題目反映研究重點
+   - 納入關鍵概念與專業術語
+
+2. 題目類型要求：
+   A. 理論導向題目：
+      - 基於文獻中的理論框架
+      - 聚焦於設計理論的發展
+      - 強調理論創新或整合
+      - 反映文獻中的理論缺口
+      - 使用理論相關的專業術語
+
+   B. 實務導向題目：
+      - 針對實際設計問題
+      - 強調解決方案的開發
+      - 連結設計實務需求
+      - 體現應用價值
+      - 使用實務相關的專業術語
+
+   C. 整合導向題目：
+      - 結合理論與實務觀點
+      - 強調創新的整合方法
+      - 平衡理論與應用
+      - 展現研究的獨特性
+      - 使用跨領域的專業術語
+
+3. 題目格式規範：
+   - 清晰準確的用詞
+   - 適當的研究範圍界定
+   - 符合學術寫作規範
+   - 中英文對照
+   - 點出研究方法或取向
+
+4. 品質要求：
+   - 確保題目的原創性
+   - 維持學術的嚴謹性
+   - 反映研究的可行性
+   - 展現研究的價值
+   - 符合設計研究領域慣例
+
+請依照以下格式回覆：
+
+===建議研究題目===
+1. 理論導向：
+[中文題目] / [English Title]
+（基於文獻分析，聚焦於[具體理論框架]的研究）
+
+2. 實務導向：
+[中文題目] / [English Title]
+（針對[具體實務問題]，提出解決方案）
+
+3. 整合導向：
+[中文題目] / [English Title]
+（結合[理論基礎]與[實務應用]的創新研究）
+
+每個題目後請附上 2-3 句說明：
+- 如何整合了前述資料
+- 研究重點為何
+- 預期貢獻""",
+    variables="研究主題：\n{topic}\n\n研究內容：\n{content}\n\n文獻資料：\n{literature_summary}"
+))
+
+register(PromptTemplate(
+    name='research_purpose',
+    shared_prefix=TAIWAN_STYLE_GUIDE,
+    system="""你是一位經驗豐富的設計研究學者，擅長整合設計理論與實務。
+
+APA 參考文獻格式：
+   - 中文文獻：
+     期刊：作者（年代）。文章標題。期刊名稱，卷（期），頁碼。
+     專書：作者（年代）。書名。出版社。
+   - 英文文獻：
+     期刊：Author, A. A. (Year). Title. Journal Name, Volume(Issue), pages.
+     專書：Author, A. A. (Year). Book title. Publisher.
+   - 中文作者姓名完整列出
+   - 英文作者姓氏加名字縮寫""",
+    instructions="""請以具有豐富設計研究與實務經驗的學者身分，根據文末提供的所有資訊，以自然且專業的學術論述方式，生成一份完整的研究目的和參考文獻。請特別注意整合所有提供的資訊，確保論述完整且字數充足。
+
+【內容整合要求】
+1. 資料運用：
+   - 完整分析研究主題中提出的問題意識
+   - 整合研究內容規劃的方法與步驟
+   - 參考文獻摘要中的理論基礎
+   - 呼應選定題目的研究方向
+   - 確保關鍵字概念在文中得到充分討論
+
+2. 內容發展：
+   - 從研究主題發展出問題意識
+   - 利用文獻摘要支持論點
+   - 結合研究內容規劃說明方法
+   - 根據前述資料推導出預期貢獻
+   - 適當引用文獻支持各項論述
+
+【研究目的撰寫要求】（至少1000字，可視內容需要增加字數）
+
+1. 論述風格：
+   - 以專業設計學術研究者的視角撰寫
+   - 運用第一人稱敘述，展現研究者的專業洞察
+   - 避免過於口語化或制式化的表達
+   - 確保論述的學術性和專業性
+
+2. 內容要素：
+   - 從設計領域的理論缺口或實務問題切入
+   - 整合並分析相關文獻的觀點
+   - 清楚說明研究動機和重要性
+   - 具體描述研究目標和方法
+   - 闡述預期的理論與實務貢獻
+
+3. 論述結構：
+   - 以連貫且完整的方式呈現（不分小標題）
+   - 確保段落之間的邏輯流暢性
+   - 適當運用轉折語句連接各個重點
+   - 由淺入深，循序漸進地展開論述
+
+4. 論述重點：
+   第一部分（至少350字）：
+   - 從設計領域現況切入問題
+   - 指出研究缺口或實務需求
+   - 引用文獻支持問題的重要性
+   - 整合研究主題的核心觀點
+
+   第二部分（至少400字）：
+   - 說明研究目標和研究問題
+   - 解釋研究方法的選擇
+   - 描述研究的具體步驟
+   - 結合研究內容的規劃說明
+
+   第三部分（至少250字）：
+   - 闡述研究的創新觀點
+   - 說明預期的理論貢獻
+   - 討論實務應用價值
+   - 點出研究限制與建議
+
+5. 文獻引用規範：
+   - 必須引用文獻摘要中提供的文獻
+   - 每個重要論點都需要文獻支持
+   - 遵循 APA 第七版引用格式：
+     * 單一作者：王小明（2020）或（王小明，2020）
+     * 兩位作者：王小明與李大華（2020）或（王小明、李大華，2020）
+     * 三位以上作者：王小明等人（2020）或（王小明等人，2020）
+     * 英文文獻比照中文格式，作者姓氏大寫
+   - 引用時要與論點緊密結合
+   - 避免過度堆砌文獻
+   - 確保引用的文獻都列在參考文獻清單中
+
+6. 寫作規範：
+   - 運用精確的設計研究專業術語
+   - 保持客觀的學術論述語氣
+   - 強調研究的原創性與價值
+   - 適當融入文獻觀點以支持論述
+
+【字數與品質控制】
+1. 字數要求：
+   - 總字數必須超過1000字
+   - 可視內容需要適度增加字數
+   - 各部分字數可依實際需求調整，但不得低於建議字數
+
+2. 品質要求：
+   - 確保論述完整性和邏輯性
+   - 避免內容重複或冗贅
+   - 保持文章結構的平衡
+   - 適當分配各部分的論述比重
+
+【參考文獻要求】
+1. 格式規範：
+   - 嚴格遵循 APA 第七版格式
+   - 依照字母順序排列
+   - 中文文獻在前，英文文獻在後
+   - 同一作者的多篇文獻依年代排序
+
+2. 引用規則：
+   - 只列出在內文中實際引用過的文獻
+   - 確保每個引用都有對應的參考文獻
+   - 每個重要論點都需要有文獻支持
+   - 引用時要標明年份，必要時標明頁碼
+
+3. 文獻類型：
+   - 學術期刊論文
+   - 研討會論文
+   - 專書或專書章節
+   - 博碩士論文（如適用）
+
+請以以下格式回覆：
+
+===研究目的===
+[至少1000字完整研究目的論述，包含適當的文獻引用，並整合所有提供的資訊]
+
+===參考文獻===
+[APA格式參考文獻列表]""",
+    variables="研究主題：{research_topic}\n\n研究內容：{research_content}\n\n文獻摘要：{literature_summary}\n\n選定標題：{selected_title}"
+))
+
+register(PromptTemplate(
+    name='review_sections',
+    system="你是一位專業的學術研究者，擅長規劃文獻探討架構。",
+    instructions="""請根據文末的研究資訊，規劃文獻探討的架構。
+
+請規劃 3-5 個文獻探討的主要段落，每個段落需包含：
+1. 段落標題
+2. 內容說明
+3. 建議的搜尋關鍵字（中英對照）
+
+回覆格式：
+===段落1===
+標題：[段落標題]
+說明：[本段落要探討的重點]
+搜尋關鍵字：[關鍵字列表]
+
+===段落2===
+...以此類推""",
+    variables="研究題目：\n{title}\n\n研究目的：\n{purpose}\n\n目前的參考文獻：\n{references}"
+))
+
+REVIEW_WRITER_SYSTEM = "你是一位專業的學術研究者，擅長撰寫文獻探討。"
+
+register(PromptTemplate(
+    name='full_review',
+    system=REVIEW_WRITER_SYSTEM,
+    instructions="""請根據文末資料，撰寫一份完整的文獻探討（至少 3500 字）。
+
+要求：
+1. 總字數至少 3500 字
+2. 依照各節規劃的主題分段撰寫
+3. 每段文獻都要適當引用並整合相關文獻
+4. 段落之間要有適當的轉折
+5. 最後要列出完整的參考文獻（APA格式）
+
+請依照以下格式回覆：
+
+===文獻探討===
+[3500字以上的文獻探討內容]
+
+===參考文獻===
+[APA格式的參考文獻列表]""",
+    variables="研究題目：\n{title}\n\n研究目的：\n{purpose}\n\n各節文獻資料：\n{collected_literature}"
+))
+
+register(PromptTemplate(
+    name='section_review',
+    system=REVIEW_WRITER_SYSTEM,
+    instructions="""請根據文末資料，撰寫文獻探討中指定一節的內容。
+
+要求：
+1. 字數須達到文末的字數要求
+2. 只撰寫本節內容，不要加入全文的前言或結論
+3. 適當引用並整合本節的文獻；本節沒有文獻時請依本節說明撰寫，不要虛構引用
+4. 最後列出本節引用的參考文獻（APA格式）
+
+請依照以下格式回覆：
+
+===文獻探討===
+[本節文獻探討內容]
+
+===參考文獻===
+[APA格式的參考文獻列表]""",
+    variables="本節標題：{section_title}\n字數要求：至少 {min_chars} 字\n\n研究題目：\n{title}\n\n研究目的：\n{purpose}\n\n本節說明：\n{description}\n\n本節文獻資料：\n{literature}"
+))
+
+register(PromptTemplate(
+    name='review_transitions',
+    system=REVIEW_WRITER_SYSTEM,
+    instructions="""文末提供研究的文獻探討各節摘要，各節內容已分別撰寫完成。
+
+請撰寫：
+1. 一段約 150 字的開場，說明文獻探討的架構
+2. 各節之間的轉折句，讓前後段落自然銜接
+
+請依照文末的回覆格式回覆，不要重寫各節內容。""",
+    variables="研究題目：{title}\n\n{outline}\n\n回覆格式：\n\n===開場===\n[開場段落]\n\n{transition_format}"
+))
+
+register(PromptTemplate(
+    name='research_structure',
+    shared_prefix=TAIWAN_STYLE_GUIDE,
+    system="""You are a professional design research methodology expert specializing in literature review structure planning.
+Please respond in Traditional Chinese (Taiwan) and follow the language guidelines above.
+
+文獻探討架構分析重點：
+   - 研究目的中的核心問題
+   - 研究方法與途徑
+   - 理論基礎需求
+   - 實務應用面向
+   - 預期研究貢獻
+   - 研究範圍界定
+   - 重要研究變項
+   - 研究創新觀點
+
+章節規劃原則：
+   - 確保章節涵蓋研究目的的所有重要面向
+   - 由基礎理論到應用實務循序漸進
+   - 各章節之間要有邏輯連貫性
+   - 配合研究方法規劃對應的理論基礎
+   - 針對創新觀點提供充分的理論支持
+
+小標題設計原則：
+   - 緊扣研究核心目標
+   - 反映該段落的主要論述重點
+   - 符合學術寫作規範
+   - 具有邏輯層次性
+   - 能清楚指引讀者理解文章結構
+   - 每個章節 3-4 個小標題
+   - 確保小標題之間的連貫性
+   - 由淺入深的漸進式安排
+
+搜尋策略規劃：
+   - 配合各章節主題設計精確的搜尋策略
+   - 考慮近五年的研究趨勢
+   - 涵蓋理論與實務的相關文獻
+   - 特別關注與研究創新點相關的文獻
+   - 納入跨領域的相關研究
+
+The response must strictly follow this JSON format with no additional text:
+{
+    "sections": [
+        {
+            "title_zh": "中文章節標題",
+            "title_en": "English Section Title",
+            "description": "本章節應該探討的重點",
+            "subtitles": [
+                {
+                    "subtitle_zh": "中文小標題",
+                    "subtitle_en": "English Subtitle",
+                    "content_focus": "此小節應該探討的具體內容重點"
+                }
+            ],
+            "search_queries": [
+                {
+                    "focus": "搜尋重點描述",
+                    "query": "A complete English sentence for academic database search that focuses on specific aspects of the research"
+                }
+            ]
+        }
+    ]
+}""",
+    instructions="""Based on the research purpose given at the end, please analyze it thoroughly and provide:
+
+1. Research Purpose Analysis:
+   - Core research questions and objectives
+   - Research methodology and approaches
+   - Theoretical foundation requirements
+   - Practical application aspects
+   - Expected research contributions
+   - Research scope and limitations
+   - Key research variables
+   - Innovative perspectives
+
+2. Literature Review Structure (3-5 sections):
+   - Each section must directly support aspects of the research purpose
+   - Sections should progress logically from theoretical to practical
+   - Include both theoretical foundations and practical applications
+   - Address innovative aspects of the research
+   - Consider interdisciplinary perspectives if relevant
+
+3. For each section, provide:
+   - Clear and specific section titles (both Chinese and English)
+   - 3-4 subtitles that:
+     * Reflect the core research objectives
+     * Show logical progression of ideas
+     * Cover key aspects of the section
+     * Guide readers through the content structure
+   - Detailed description of key points to be discussed
+   - 2-3 targeted search queries that:
+     * Can be directly used in academic databases
+     * Use complete, natural English sentences
+     * Cover the most important search aspects
+     * Consider research trends in the past five years
+     * Focus on specific aspects of the research purpose
+
+Please strictly follow the JSON format specified in the system message, with no additional explanation.""",
+    variables="Research Purpose:\n{research_purpose}"
+))
+
+register(PromptTemplate(
+    name='structure_repair',
+    system=f"""You are a professional design research methodology expert specializing in literature review structure planning.
+{TAIWAN_STYLE_NOTE}""",
+    instructions="""【格式修正】先前產生的文獻探討架構中，文末列出的章節缺少欄位或格式不正確。
+請依照研究目的補齊每個章節，保留已有的內容，並依原本的編號順序回覆，不要加入其他章節。
+
+The response must strictly follow this JSON format with no additional text:
+{
+    "sections": [
+        {
+            "title_zh": "中文章節標題",
+            "title_en": "English Section Title",
+            "description": "本章節應該探討的重點",
+            "subtitles": [
+                {
+                    "subtitle_zh": "中文小標題",
+                    "subtitle_en": "English Subtitle",
+                    "content_focus": "此小節應該探討的具體內容重點"
+                }
+            ],
+            "search_queries": [
+                {
+                    "focus": "搜尋重點描述",
+                    "query": "A complete English sentence for academic database search"
+                }
+            ]
+        }
+    ]
+}""",
+    variables="Research Purpose:\n{research_purpose}\n\n需要修正的章節：\n{sections}"
+))
+
+register(PromptTemplate(
+    name='literature_analysis',
+    system=f"""您是一位專業的文獻分析專家，請協助分析輸入的多篇文獻內容。
+{TAIWAN_STYLE_NOTE}
+從輸入的文字中識別出每篇文獻的 APA 引用格式和摘要內容，並進行分析整理。
+每篇文獻之間應該是用連續兩個換行符號分隔。""",
+    instructions="""請分析文末輸入的多篇文獻內容，並按照以下格式整理每一篇：
+1. 識別並擷取每篇文獻的 APA 引用格式
+2. 擷取每篇文獻的摘要內容
+3. 分析每篇文獻與文末指定章節的相關性
+4. 提供每篇文獻對該章節的主要貢獻
+5. 建議在文獻回顧中如何引用每篇文獻
+
+請使用以下 JSON 格式回覆，包含所有文獻的分析結果，index 對應輸入的文獻編號：
+{
+    "literature": [
+        {
+            "index": 1,
+            "citation": "APA引用格式",
+            "abstract": "摘要內容",
+            "relevance": "與章節的相關性分析",
+            "contribution": "對章節的主要貢獻",
+            "usage_suggestion": "在文獻回顧中的引用建議"
+        }
+    ]
+}""",
+    variables="章節：{section_title}\n\n輸入內容：\n{literature_texts}"
+))
+
+register(PromptTemplate(
+    name='literature_assessment',
+    system=f"""您是一位專業的文獻分析專家，請協助評估多篇文獻對指定章節的價值。
+{TAIWAN_STYLE_NOTE}
+每篇文獻的引用格式與摘要已經整理完成，只需要提供評估內容。""",
+    instructions="""請評估文末編號列出的每一篇文獻：
+1. 分析每篇文獻與文末指定章節的相關性
+2. 提供每篇文獻對該章節的主要貢獻
+3. 建議在文獻回顧中如何引用每篇文獻
+
+不需要重複引用格式或摘要。請使用以下 JSON 格式回覆，index 對應文獻編號，每篇文獻都必須有一筆：
+{
+    "assessments": [
+        {
+            "index": 1,
+            "relevance": "與章節的相關性分析",
+            "contribution": "對章節的主要貢獻",
+            "usage_suggestion": "在文獻回顧中的引用建議"
+        }
+    ]
+}""",
+    variables="章節：{section_title}\n\n文獻列表：\n{literature_list}"
+))
+
+# 章節文獻探討與增量更新共用的系統訊息
+LITERATURE_REVIEW_SYSTEM = """你是一位深耕於設計研究領域的專業學術研究者，擅長整合設計理論與實務。
+
+文獻探討撰寫規範：
+   - 確保論述完整性和邏輯性
+   - 避免內容重複或冗贅
+   - 保持文章結構的平衡
+   - 適當分配各部分的論述比重
+   - 運用精確的設計研究專業術語
+   - 保持客觀的學術論述語氣
+   - 強調研究的原創性與價值
+
+文獻引用規範：
+   - 遵循 APA 第七版格式
+   - 每個重要論點都需要文獻支持
+   - 引用時要與論點緊密結合
+   - 避免過度堆砌文獻
+   - 確保引用的文獻都列在參考文獻清單中
+   - 引用格式：
+     * 單一作者：王小明（2020）或（王小明，2020）
+     * 兩位作者：王小明與李大華（2020）或（王小明、李大華，2020）
+     * 三位以上作者：王小明等人（2020）或（王小明等人，2020）
+     * 英文文獻比照中文格式，作者姓氏大寫"""
+
+register(PromptTemplate(
+    name='literature_review',
+    shared_prefix=TAIWAN_STYLE_GUIDE,
+    system=LITERATURE_REVIEW_SYSTEM,
+    instructions="""請根據文末的文獻資料，撰寫文末指定章節的文獻探討內容。
+
+【寫作要求】
+
+1. 字數與品質要求：
+   - 本章節文字至少 1200 字（必須超過此字數，不得低於）
+   - 確保論述完整且深入
+   - 避免空泛或表面的描述
+   - 每個論點都要有充分的文獻支持
+   - 適當引用文獻中的具體研究發現
+
+2. 內容發展要求：
+   - 深入分析文獻中的理論觀點
+   - 比較不同研究的方法與發現
+   - 整合相似觀點，對比相異觀點
+   - 指出研究趨勢與發展脈絡
+   - 連結理論基礎與實務應用
+   - 突顯重要研究發現與貢獻
+
+3. 論述結構要求：
+   - 以連貫且完整的方式呈現
+   - 確保段落之間的邏輯流暢性
+   - 適當運用轉折語句連接各個重點
+   - 由淺入深，循序漸進地展開論述
+   - 適度分段以增加可讀性
+
+4. 文獻整合要求：
+   - 確保引用的文獻相互呼應
+   - 建立文獻之間的對話關係
+   - 適當比較不同研究的觀點
+   - 指出文獻間的共同發現
+   - 分析相異觀點的原因
+
+5. 學術嚴謹度：
+   - 確保每個論點都有文獻支持
+   - 準確引用研究發現和結論
+   - 客觀呈現不同觀點
+   - 適當評析研究限制
+   - 指出未來研究方向
+
+6. 與研究目的的連結：
+   - 確保文獻探討方向與研究目的一致
+   - 選擇性強調與研究相關的文獻觀點
+   - 分析文獻對研究問題的貢獻
+   - 指出文獻中的理論缺口
+   - 說明本研究的潛在貢獻
+
+請提供：
+1. 完整的文獻探討內容（至少 1200 字，可視內容需要增加字數）
+2. 該章節使用的參考文獻 APA 格式列表
+
+回覆格式：
+===文獻探討===
+[1200字以上的文獻探討內容]
+
+===參考文獻===
+[APA格式參考文獻列表]""",
+    variables="章節：{section_title}\n\n文獻資料：\n{literature_data}"
+))
+
+register(PromptTemplate(
+    name='literature_review_update',
+    system=f"{TAIWAN_STYLE_NOTE}\n\n{LITERATURE_REVIEW_SYSTEM}",
+    instructions="""請將文末「新增文獻資料」中的文獻整合進文末的「現有文獻探討」，產生修訂後的完整文獻探討。
+
+【修訂要求】
+1. 保留現有文獻探討的架構、論點與引用，只在相關段落加入新文獻的觀點與研究發現
+2. 新文獻與既有論點相呼應時併入該段落；提出不同觀點時加以比較；涵蓋新的主題時可增加段落
+3. 每篇新增文獻至少引用一次，引用格式與現有內容一致
+4. 調整必要的轉折語句，使全文連貫，不要重複既有內容
+5. 修訂後的字數不少於現有內容
+6. 參考文獻列出修訂後全文引用的所有文獻（包含原有與新增的文獻），使用 APA 第七版格式
+
+回覆格式：
+===文獻探討===
+[修訂後的完整文獻探討內容]
+
+===參考文獻===
+[APA格式參考文獻列表]""",
+    variables="章節：{section_title}\n\n現有文獻探討：\n{current_review}\n\n現有參考文獻：\n{current_references}\n\n新增文獻資料：\n{literature_data}"
+))
+
+
+if __name__ == '__main__':
+    print(f"{'template':<26}{'prefix':>8}{'system':>8}{'instr.':>8}{'static':>8}  cacheable")
+    for row in prompt_size_report():
+        print(
+            f"{row['name']:<26}{row['shared_prefix_tokens']:>8}{row['system_tokens']:>8}"
+            f"{row['instruction_tokens']:>8}{row['static_tokens']:>8}  {'yes' if row['cacheable'] else 'no'}"
+        )
@@ -0,0 +1,237 @@
+import contextvars
+import email.utils
+import itertools
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 整個程序共用的 OpenAI 速率限制（每分鐘請求數與 token 數，0 表示不限制），請依帳號等級調整
+RATE_LIMIT_RPM = int(os.getenv('LLM_RATE_LIMIT_RPM', '500'))
+RATE_LIMIT_TPM = int(os.getenv('LLM_RATE_LIMIT_TPM', '200000'))
+
+# 速率限制或暫時性錯誤的重試設定：最多重試次數、指數退避的起始與最長等待秒數
+MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '5'))
+RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '1.0'))
+RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '60'))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+_session = contextvars.ContextVar('rate_limit_session', default='default')
+
+
+class TokenBucket:
+    """每分鐘補充 rate_per_minute 個單位的 token bucket；rate_per_minute 為 0 時不限制"""
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = float(rate_per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """取得 amount 個單位還需要等待的秒數；超過容量的請求在 bucket 滿時放行"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount, now):
+        if self.rate:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def refund(self, amount):
+        """歸還預估過多的用量"""
+        if self.rate:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """程序共用的請求排程器：以 token bucket 限制每分鐘請求數與 token 數，並在各 session 之間輪流放行
+
+    每個 session 有自己的等待佇列，排程時依序輪流取各 session 的第一個請求，
+    避免同一位使用者大量並行的請求佔滿額度而讓其他人長時間等待。
+    """
+
+    def __init__(self, rpm=0, tpm=0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+        self._paused_until = 0.0
+        self._tickets = itertools.count()
+        self.stats = {'granted': 0, 'throttled': 0, 'retries': 0}
+
+    def acquire(self, session_id, tokens):
+        """等待輪到此 session 且額度足夠後才返回"""
+        ticket = next(self._tickets)
+        with self._cond:
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            throttled = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._next_ticket() == ticket:
+                        wait = max(
+                            self._paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now)
+                        )
+                        if wait <= 0:
+                            self.requests.consume(1, now)
+                            self.tokens.consume(tokens, now)
+                            self._advance(session_id)
+                            self.stats['granted'] += 1
+                            self.stats['throttled'] += int(throttled)
+                            self._cond.notify_all()
+                            return
+                    throttled = True
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                self._remove(session_id, ticket)
+                self._cond.notify_all()
+                raise
+
+    def _next_ticket(self):
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+
+    def _advance(self, session_id):
+        # 放行 session 的第一個請求後，把此 session 移到輪替順序的最後
+        queue = self._queues.pop(session_id)
+        queue.popleft()
+        if queue:
+            self._queues[session_id] = queue
+
+    def _remove(self, session_id, ticket):
+        queue = self._queues.get(session_id)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[session_id]
+
+    def refund(self, tokens):
+        """實際用量少於預估時歸還差額，請求失敗時歸還整筆預留"""
+        if tokens > 0:
+            with self._cond:
+                self.tokens.refund(tokens)
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        """收到速率限制錯誤時，暫停所有 session 的請求直到指定秒數後"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def record_retry(self):
+        with self._cond:
+            self.stats['retries'] += 1
+
+    def queue_position(self, session_id):
+        """此 session 最前面的請求在輪替順序中的位置（1 表示下一個放行），沒有等待中的請求時回傳 0"""
+        with self._cond:
+            for position, queued_session in enumerate(self._queues, start=1):
+                if queued_session == session_id:
+                    return position
+        return 0
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """取得程序共用的速率限制器（依環境變數設定）"""
+    global _default_limiter
+    if _default_limiter is None:
+        with _default_limiter_lock:
+            if _default_limiter is None:
+                _default_limiter = RateLimiter(RATE_LIMIT_RPM, RATE_LIMIT_TPM)
+    return _default_limiter
+
+
+def bind_request_session(session_id):
+    """將目前執行環境（含其後建立的工作執行緒）的請求歸屬到指定 session，用於公平排程"""
+    _session.set(session_id)
+
+
+def current_session_id():
+    return _session.get()
+
+
+def _retry_after(error):
+    """讀取錯誤回應中的 Retry-After（秒數或 HTTP 日期），沒有時回傳 None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """速率限制、逾時、連線錯誤與伺服器暫時性錯誤可以重試"""
+    # 呼叫 API 時 openai 已經載入，在此匯入不會增加頁面的啟動時間
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+
+def retry_delay(error, attempt):
+    """計算下一次重試前的等待秒數：優先採用 Retry-After，否則使用帶抖動的指數退避"""
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY) + random.uniform(0, RETRY_BASE_DELAY * 0.1)
+    cap = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+def call_with_rate_limit(func, estimated_tokens):
+    """在共用速率限制下呼叫 func()，遇到可重試的錯誤時退避後重新排隊
+
+    速率限制錯誤（429）會暫停所有 session 的請求，避免其他人的請求在等待期間繼續觸發錯誤。
+    失敗的請求沒有取得回應，先歸還此次預留的 token 再退避重試，重試時重新預留。
+    """
+    limiter = get_rate_limiter()
+    session_id = current_session_id()
+    for attempt in itertools.count():
+        limiter.acquire(session_id, estimated_tokens)
+        try:
+            return func()
+        except Exception as e:
+            limiter.refund(estimated_tokens)
+            if attempt >= MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt)
+            limiter.record_retry()
+            if getattr(e, 'status_code', None) == 429:
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
@@ -0,0 +1,138 @@
+import re
+import unicodedata
+
+import numpy as np
+
+# 本機相關性排序：以 BM25 計算每篇文獻（引用格式與摘要）與章節說明的相關程度，不呼叫模型、不耗用 token。
+# 中文沒有空白分詞，以相鄰兩個漢字（bigram）為詞；英文以單字為詞。
+# 漢字 bigram 直接以 NumPy 陣列處理整批文獻的字元編碼，數百篇摘要只需數毫秒。
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+LATIN_WORD_PATTERN = re.compile(r'[a-z0-9]{2,}')
+# 串接多份文件時的分隔字元：不是漢字也不是英文單字，前後不會組成 bigram
+DOCUMENT_SEPARATOR = '\x00'
+ENGLISH_STOPWORDS = frozenset("""
+a an and are as at be been by can for from has have how in into is it its of on or that the their these this
+those to was were what which while with within without between through using use used study studies research
+""".split())
+
+# 漢字的 Unicode 範圍（CJK 統一漢字、擴充 A 與相容漢字）
+CJK_RANGES = ((0x4E00, 0x9FFF), (0x3400, 0x4DBF), (0xF900, 0xFAFF))
+# 字元編碼最多 21 位元，兩個字元合併成一個 int64 作為 bigram 的鍵
+CODEPOINT_BITS = 21
+
+
+def _normalize(text):
+    # 全形轉半形並統一大小寫
+    return unicodedata.normalize('NFKC', text or '').casefold().replace(DOCUMENT_SEPARATOR, ' ')
+
+
+def _is_cjk(codes):
+    mask = np.zeros(codes.shape, dtype=bool)
+    for start, end in CJK_RANGES:
+        mask |= (codes >= start) & (codes <= end)
+    return mask
+
+
+def _cjk_bigrams(text):
+    """回傳 (bigram 鍵陣列, 所在位置)；text 中以非漢字分隔的字元不會組成 bigram"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    if len(codes) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    cjk = _is_cjk(codes)
+    positions = np.flatnonzero(cjk[:-1] & cjk[1:])
+    return (codes[positions] << CODEPOINT_BITS) | codes[positions + 1], positions
+
+
+def _latin_words(text):
+    return [word for word in LATIN_WORD_PATTERN.findall(text) if word not in ENGLISH_STOPWORDS]
+
+
+def section_query_text(section):
+    """組合章節的標題、重點說明、小標題與建議搜尋字串，作為排序的查詢"""
+    parts = [section.get('title_zh'), section.get('title_en'), section.get('description')]
+    for subtitle in section.get('subtitles') or []:
+        if isinstance(subtitle, dict):
+            parts.extend([subtitle.get('subtitle_zh'), subtitle.get('subtitle_en'), subtitle.get('content_focus')])
+        else:
+            parts.append(str(subtitle))
+    for search in section.get('search_queries') or []:
+        if isinstance(search, dict):
+            parts.extend([search.get('focus'), search.get('query')])
+    return '\n'.join(part for part in parts if isinstance(part, str))
+
+
+def paper_text(paper):
+    """文獻用來排序的文字：引用格式（含標題）與摘要；不使用模型撰寫的相關性說明"""
+    return f"{paper.get('citation') or ''}\n{paper.get('abstract') or ''}"
+
+
+def bm25_scores(query, documents, k1=BM25_K1, b=BM25_B):
+    """計算每份文件對查詢的 BM25 分數，回傳與 documents 等長的 NumPy 陣列
+
+    只統計查詢中出現的詞，詞頻矩陣大小為 文件數 × 查詢詞數。
+    """
+    if not documents:
+        return np.zeros(0)
+    query = _normalize(query)
+    query_bigrams, _ = _cjk_bigrams(query)
+    query_words = _latin_words(query)
+    bigram_terms, bigram_weights = np.unique(query_bigrams, return_counts=True)
+    word_terms = {}
+    for word in query_words:
+        word_terms[word] = word_terms.get(word, 0) + 1
+    word_index = {word: len(bigram_terms) + index for index, word in enumerate(word_terms)}
+    weights = np.concatenate([bigram_weights, np.fromiter(word_terms.values(), dtype=np.int64, count=len(word_terms))])
+    term_count = len(weights)
+    if term_count == 0:
+        return np.zeros(len(documents))
+
+    # 所有文件串接後一次取出漢字 bigram 與英文單字，再依位置對應回各文件
+    texts = [_normalize(document) for document in documents]
+    joined = DOCUMENT_SEPARATOR.join(texts)
+    char_docs = np.repeat(np.arange(len(texts)), [len(text) + 1 for text in texts])
+    bigrams, positions = _cjk_bigrams(joined)
+    bigram_docs = char_docs[positions]
+    cells = []
+    if len(bigram_terms):
+        slots = np.searchsorted(bigram_terms, bigrams).clip(max=len(bigram_terms) - 1)
+        hits = bigram_terms[slots] == bigrams
+        cells.append(bigram_docs[hits] * term_count + slots[hits])
+
+    # 英文單字對應到查詢詞的欄位；-1 為其他單字，-2 為文件分隔，-3 為停用詞（不計入文件長度）
+    lookup = dict.fromkeys(ENGLISH_STOPWORDS, -3)
+    lookup.update(word_index)
+    lookup[DOCUMENT_SEPARATOR] = -2
+    words = re.findall(f'{LATIN_WORD_PATTERN.pattern}|{DOCUMENT_SEPARATOR}', joined)
+    columns = np.fromiter((lookup.get(word, -1) for word in words), dtype=np.int64, count=len(words))
+    word_docs = np.cumsum(columns == -2)
+    counted = columns >= -1
+    matched = columns >= 0
+    cells.append(word_docs[matched] * term_count + columns[matched])
+
+    lengths = (np.bincount(bigram_docs, minlength=len(texts)) + np.bincount(word_docs[counted], minlength=len(texts))).astype(float)
+    tf = np.bincount(np.concatenate(cells), minlength=len(texts) * term_count).reshape(len(texts), term_count)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(texts) - df + 0.5) / (df + 0.5))
+    average_length = lengths.mean() or 1.0
+    norm = k1 * (1 - b + b * lengths / average_length)
+    return (tf * (k1 + 1) / (tf + norm[:, None])) @ (idf * weights)
+
+
+def rank_papers(section, papers):
+    """依與章節的相關程度排序，回傳 (由高到低的文獻索引陣列, 各文獻分數)；分數相同時保留原本順序"""
+    scores = bm25_scores(section_query_text(section), [paper_text(paper) for paper in papers])
+    return np.argsort(-scores, kind='stable'), scores
+
+
+def select_top_papers(section, papers, top_k):
+    """依與章節的相關程度由高到低回傳前 top_k 篇文獻；top_k <= 0 時回傳全部（同樣依相關程度排序）"""
+    if not papers:
+        return []
+    order, _ = rank_papers(section, papers)
+    if top_k > 0:
+        order = order[:top_k]
+    return [papers[index] for index in order]
@@ -0,0 +1,330 @@
+import os
+
+import environment  # noqa: F401  須最先匯入：載入 .env 後其他模組才讀取設定
+from context_packer import merge_pack_reports, pack_literature, pack_literature_groups
+from engine_types import FullContent, GenerationError, ReviewTransitions, engine_step
+from llm_gateway import complete_chat
+from openai_client import LazyOpenAIClient
+from prompt_templates import render_prompt
+from section_stream import (
+    SectionStreamParser, complete_chat_streamed, has_content_and_references, merge_references,
+    split_content_and_references
+)
+from task_pool import map_concurrently
+from token_budget import truncate_to_tokens
+
+# 研究目的與文獻探討的生成引擎：不依賴 Streamlit，可在 Streamlit 頁面、背景工作、批次工具與執行緒池中呼叫。
+# 失敗時拋出 engine_types 定義的例外；stream_container / progress_container 只需提供 markdown(text) 方法。
+
+# 共用的 OpenAI 客戶端（各頁面共用同一個連線池），第一次呼叫 API 時才建立
+client = LazyOpenAIClient()
+
+# 提示詞中文獻資料的 token 上限，超過時先裁切再送出
+LITERATURE_SUMMARY_MAX_TOKENS = int(os.getenv("LITERATURE_SUMMARY_MAX_TOKENS", "6000"))
+COLLECTED_LITERATURE_MAX_TOKENS = int(os.getenv("COLLECTED_LITERATURE_MAX_TOKENS", "8000"))
+SECTION_LITERATURE_MAX_TOKENS = int(os.getenv("SECTION_LITERATURE_MAX_TOKENS", "6000"))
+
+# 文獻探討生成方式："hierarchical" 分節並行撰寫後銜接，"single" 單次呼叫生成全文
+REVIEW_GENERATION_MODE = os.getenv("REVIEW_GENERATION_MODE", "hierarchical")
+FULL_REVIEW_MIN_CHARS = 3500
+SECTION_REVIEW_MIN_CHARS = 700
+SECTION_REVIEW_MAX_TOKENS = int(os.getenv("SECTION_REVIEW_MAX_TOKENS", "2000"))
+SECTION_REVIEW_CONCURRENCY = int(os.getenv("SECTION_REVIEW_CONCURRENCY", "5"))
+
+@engine_step("generate_keywords")
+def request_keywords(topic, content):
+    """呼叫模型生成關鍵字"""
+    response_text = complete_chat(
+        client,
+        step="generate_keywords",
+        validate=str.strip,
+        model="gpt-3.5-turbo",
+        messages=render_prompt('keywords', topic=topic, content=content),
+        temperature=0.3
+    )
+    # 從回應中提取內容並過濾空行
+    return [line.strip() for line in response_text.strip().splitlines() if line.strip()]
+
+def normalize_keywords(selected_keywords):
+    """將選取的關鍵字正規化為排序後的唯一組合，作為搜尋查詢的快取鍵"""
+    normalized = {' '.join(keyword.split()) for keyword in selected_keywords if keyword and keyword.strip()}
+    return tuple(sorted(normalized))
+
+@engine_step("generate_search_query")
+def request_search_query(normalized_keywords):
+    """呼叫模型依正規化後的關鍵字組合生成英文搜尋句子"""
+    response_text = complete_chat(
+        client,
+        step="generate_search_query",
+        validate=str.strip,
+        model="gpt-3.5-turbo",
+        messages=render_prompt('search_query', keywords=', '.join(normalized_keywords)),
+        temperature=0.3
+    )
+
+    # 從回應中提取搜尋句子
+    return response_text.strip()
+
+def fallback_search_query(normalized_keywords):
+    """無法呼叫模型時改用英文關鍵字直接組成搜尋字串"""
+    english_keywords = [k.split(' / ')[-1].strip() for k in normalized_keywords]
+    return ' '.join(english_keywords)
+
+@engine_step("generate_titles")
+def request_titles(topic, content, literature_summary):
+    """呼叫模型生成研究題目選項"""
+    response_text = complete_chat(
+        client,
+        step="generate_titles",
+        validate=lambda text: parse_title_options(text.strip()),
+        model="gpt-3.5-turbo",
+        messages=render_prompt(
+            'titles',
+            topic=topic,
+            content=content,
+            literature_summary=truncate_to_tokens(literature_summary, LITERATURE_SUMMARY_MAX_TOKENS)
+        ),
+        temperature=0.7
+    )
+    return response_text.strip()
+
+def parse_title_options(generated_titles):
+    """將模型回傳的研究題目選項解析為 [{'type', 'title', 'description'}]"""
+    titles_section = generated_titles.split('===建議研究題目===')
+    if len(titles_section) < 2:
+        return []
+    titles = []
+    current_title = {"type": "", "title": "", "description": ""}
+    for line in titles_section[1].strip().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('1. ') or line.startswith('2. ') or line.startswith('3. '):
+            if current_title["title"]:
+                titles.append(current_title.copy())
+                current_title = {"type": "", "title": "", "description": ""}
+            current_title["type"] = line
+        elif '/' in line and not line.startswith('（'):
+            current_title["title"] = line
+        elif line.startswith('（'):
+            current_title["description"] = line
+    if current_title["title"]:
+        titles.append(current_title.copy())
+    return titles
+
+@engine_step("generate_full_content")
+def request_full_content(research_topic, research_content, literature_summary, selected_title, stream_container=None):
+    """呼叫模型生成研究目的和參考文獻，回傳 FullContent（提供 stream_container 時即時串流顯示）"""
+    response_text = complete_chat_streamed(
+        client,
+        stream_container,
+        step="generate_full_content",
+        validate=lambda text: has_content_and_references(text, '===研究目的==='),
+        model="gpt-3.5-turbo",
+        messages=render_prompt(
+            'research_purpose',
+            research_topic=research_topic,
+            research_content=research_content,
+            literature_summary=truncate_to_tokens(literature_summary, LITERATURE_SUMMARY_MAX_TOKENS),
+            selected_title=selected_title
+        ),
+        temperature=0.7,
+        max_tokens=2500
+    )
+    # 分割研究目的和參考文獻
+    return FullContent(*split_content_and_references(response_text.strip(), '===研究目的==='))
+
+def parse_review_sections(text):
+    """將 ===段落N=== 格式的回應解析為 [{'order', 'title', 'description', 'search_terms'}]"""
+    sections = []
+    current_section = {}
+
+    for line in text.splitlines():
+        if line.startswith('===段落') and line.endswith('==='):
+            if current_section:
+                sections.append(current_section)
+            current_section = {'order': len(sections) + 1}
+        elif line.startswith('標題：'):
+            current_section['title'] = line.replace('標題：', '').strip()
+        elif line.startswith('說明：'):
+            current_section['description'] = line.replace('說明：', '').strip()
+        elif line.startswith('搜尋關鍵字：'):
+            current_section['search_terms'] = line.replace('搜尋關鍵字：', '').strip()
+
+    if current_section:
+        sections.append(current_section)
+
+    return sections
+
+@engine_step("generate_literature_review_sections")
+def request_literature_review_sections(title, purpose, references):
+    """呼叫模型規劃文獻探討的分節架構"""
+    response_text = complete_chat(
+        client,
+        step="generate_literature_review_sections",
+        validate=lambda text: parse_review_sections(text.strip()),
+        model="gpt-3.5-turbo",
+        messages=render_prompt('review_sections', title=title, purpose=purpose, references=references),
+        temperature=0.7
+    )
+    return parse_review_sections(response_text.strip())
+
+@engine_step("draft_section_review")
+def request_section_review(title, purpose, section, literature, target_chars):
+    """撰寫單一段落的文獻探討；文獻資料打包到 SECTION_LITERATURE_MAX_TOKENS 內，打包報告記錄在 context"""
+    packed = pack_literature(literature, SECTION_LITERATURE_MAX_TOKENS)
+    response_text = complete_chat(
+        client,
+        step="draft_section_review",
+        validate=lambda text: has_content_and_references(text, '===文獻探討==='),
+        model="gpt-3.5-turbo",
+        messages=render_prompt(
+            'section_review',
+            section_title=section.get('title', ''),
+            min_chars=target_chars,
+            title=title,
+            purpose=purpose,
+            description=section.get('description', ''),
+            literature=packed.text or '（本節尚未收集文獻）'
+        ),
+        temperature=0.7,
+        max_tokens=SECTION_REVIEW_MAX_TOKENS
+    )
+    content, references = split_content_and_references(response_text.strip(), '===文獻探討===')
+    return {'content': content, 'references': references, 'context': packed.report}
+
+@engine_step("stitch_review_transitions")
+def request_review_transitions(title, sections, drafts):
+    """產生全文開場段落與各節之間的轉折句，回傳 ReviewTransitions"""
+    outline = '\n\n'.join(
+        f"第 {index} 節：{section.get('title', '')}\n開頭：{draft['content'][:150]}\n結尾：{draft['content'][-150:]}"
+        for index, (section, draft) in enumerate(zip(sections, drafts), start=1)
+    )
+    transition_format = '\n\n'.join(
+        f"===轉折{index}===\n[銜接第 {index} 節與第 {index + 1} 節的一到兩句轉折]"
+        for index in range(1, len(sections))
+    )
+    response_text = complete_chat(
+        client,
+        step="stitch_review_transitions",
+        model="gpt-3.5-turbo",
+        messages=render_prompt('review_transitions', title=title, outline=outline, transition_format=transition_format),
+        temperature=0.5,
+        max_tokens=800
+    )
+    parser = SectionStreamParser()
+    parser.feed(response_text)
+    parser.finish()
+    intro = parser.sections.get('開場', '').strip()
+    transitions = [parser.sections.get(f'轉折{index}', '').strip() for index in range(1, len(sections))]
+    return ReviewTransitions(intro, transitions)
+
+def assemble_literature_review(sections, drafts, intro='', transitions=None):
+    """依各節順序組合文獻探討全文"""
+    parts = [intro] if intro else []
+    for index, (section, draft) in enumerate(zip(sections, drafts)):
+        if draft is None:
+            continue
+        parts.append(f"### {section.get('title', '')}\n\n{draft['content']}")
+        if transitions and index < len(transitions) and transitions[index]:
+            parts.append(transitions[index])
+    return '\n\n'.join(parts)
+
+@engine_step("generate_hierarchical_literature_review")
+def request_hierarchical_literature_review(title, purpose, sections, collected_literature, progress_container=None):
+    """分節並行撰寫文獻探討，再以簡短的銜接步驟加入開場與轉折；總耗時接近最慢的一節
+
+    部分段落失敗時仍回傳其餘段落，失敗的段落列在 'failed_sections'，銜接步驟的錯誤記錄在 'transition_error'；
+    所有段落都失敗時拋出 GenerationError。
+    """
+    target_chars = max(FULL_REVIEW_MIN_CHARS // len(sections), SECTION_REVIEW_MIN_CHARS)
+    drafts = [None] * len(sections)
+    failures = []
+    results = map_concurrently(
+        lambda section: request_section_review(
+            title, purpose, section,
+            collected_literature.get(f"literature_{section['order']}", []),
+            target_chars
+        ),
+        sections,
+        SECTION_REVIEW_CONCURRENCY
+    )
+    for index, draft, error in results:
+        if error is not None:
+            failures.append(sections[index].get('title', ''))
+            continue
+        drafts[index] = draft
+        if progress_container is not None:
+            done = sum(draft is not None for draft in drafts)
+            progress_container.markdown(
+                f"*已完成 {done}/{len(sections)} 節*\n\n" + assemble_literature_review(sections, drafts)
+            )
+
+    completed = [(section, draft) for section, draft in zip(sections, drafts) if draft is not None]
+    if not completed:
+        raise GenerationError(f"所有段落都生成失敗：{'、'.join(failures)}")
+    completed_sections = [section for section, _ in completed]
+    completed_drafts = [draft for _, draft in completed]
+
+    # 銜接步驟失敗時仍保留各節內容
+    intro, transitions = '', []
+    transition_error = None
+    if len(completed) > 1:
+        try:
+            intro, transitions = request_review_transitions(title, completed_sections, completed_drafts)
+        except GenerationError as e:
+            transition_error = str(e)
+
+    return {
+        'content': assemble_literature_review(completed_sections, completed_drafts, intro, transitions),
+        'references': merge_references(draft['references'] for draft in completed_drafts),
+        'failed_sections': failures,
+        'transition_error': transition_error,
+        'context': merge_pack_reports(draft['context'] for draft in completed_drafts)
+    }
+
+@engine_step("generate_full_literature_review")
+def request_full_literature_review(title, purpose, sections, collected_literature, stream_container=None, mode=None):
+    """生成完整的文獻探討內容，回傳 {'content', 'references', 'context'}（context 為文獻資料的打包報告）
+
+    mode 為 "hierarchical" 時分節並行撰寫後銜接（結果另含 'failed_sections' 與 'transition_error'），
+    為 "single" 時以單次呼叫生成（提供 stream_container 時即時串流顯示）。
+    """
+    if (mode or REVIEW_GENERATION_MODE) == 'hierarchical' and sections:
+        return request_hierarchical_literature_review(
+            title, purpose, sections, collected_literature, progress_container=stream_container
+        )
+
+    # 依章節順序打包各節文獻，章節標題取代原本的 literature_<order> 鍵
+    groups = [
+        (section.get('title', ''), collected_literature.get(f"literature_{section['order']}", []))
+        for section in sections or []
+    ]
+    known = {f"literature_{section['order']}" for section in sections or []}
+    groups.extend((key, papers) for key, papers in collected_literature.items() if key not in known)
+    packed = pack_literature_groups(groups, COLLECTED_LITERATURE_MAX_TOKENS)
+
+    response_text = complete_chat_streamed(
+        client,
+        stream_container,
+        step="generate_full_literature_review",
+        validate=lambda text: has_content_and_references(text, '===文獻探討==='),
+        model="gpt-3.5-turbo",
+        messages=render_prompt(
+            'full_review',
+            title=title,
+            purpose=purpose,
+            collected_literature=packed.text
+        ),
+        temperature=0.7,
+        max_tokens=4000
+    )
+
+    result = response_text.strip()
+    review_content, references = split_content_and_references(result, '===文獻探討===')
+
+    return {
+        'content': review_content,
+        'references': references,
+        'context': packed.report
+    }
@@ -0,0 +1,118 @@
+import re
+import time
+
+from llm_gateway import complete_chat, stream_chat
+
+# ===標記=== 分段格式（例如 ===研究目的===、===參考文獻===）
+MARKER_PATTERN = re.compile(r'===([^=\n]{1,40})===')
+# 串流尾端可能是尚未完整的標記（例如 "==" 或 "===參考"）
+PARTIAL_MARKER_PATTERN = re.compile(r'={1,3}|===[^=\n]{1,40}={0,2}')
+PARTIAL_MARKER_MAX_LENGTH = 46
+
+REFERENCES_MARKER = '===參考文獻==='
+
+
+def split_content_and_references(text, content_marker):
+    """依 ===參考文獻=== 將模型回應拆成正文與參考文獻"""
+    parts = text.split(REFERENCES_MARKER)
+    content = parts[0].replace(content_marker, '').strip()
+    references = parts[1].strip() if len(parts) > 1 else ''
+    return content, references
+
+
+def has_content_and_references(text, content_marker):
+    """回應是否同時包含正文與參考文獻（缺少任一部分通常表示回應被截斷或格式錯誤，不應寫入快取）"""
+    return all(split_content_and_references(text.strip(), content_marker))
+
+
+def merge_references(reference_blocks):
+    """合併多節的參考文獻並去除重複，中文文獻在前、英文文獻在後"""
+    seen = set()
+    references = []
+    for block in reference_blocks:
+        for line in block.splitlines():
+            line = line.strip()
+            key = ' '.join(line.lower().split())
+            if line and key not in seen:
+                seen.add(key)
+                references.append(line)
+    return '\n'.join(sorted(references, key=lambda line: (line[:1].isascii(), line)))
+
+
+class SectionStreamParser:
+    """增量解析以 ===標記=== 分段的串流文字；標記被切在不同片段時也能正確辨識"""
+
+    def __init__(self):
+        self._buffer = ''
+        self.current = None
+        self.sections = {None: ''}
+
+    def _append(self, text):
+        if text:
+            self.sections[self.current] += text
+
+    @staticmethod
+    def _pending_marker_start(text):
+        """找出尾端可能屬於未完成標記的起始位置，找不到時回傳文字長度"""
+        for position in range(max(0, len(text) - PARTIAL_MARKER_MAX_LENGTH), len(text)):
+            if text[position] == '=' and PARTIAL_MARKER_PATTERN.fullmatch(text, position):
+                return position
+        return len(text)
+
+    def feed(self, chunk):
+        """輸入一段串流文字"""
+        self._buffer += chunk
+        while True:
+            match = MARKER_PATTERN.search(self._buffer)
+            if not match:
+                break
+            self._append(self._buffer[:match.start()])
+            self.current = match.group(1).strip()
+            self.sections.setdefault(self.current, '')
+            self._buffer = self._buffer[match.end():]
+
+        # 保留可能是未完成標記的尾端，等待下一段文字
+        pending = self._pending_marker_start(self._buffer)
+        self._append(self._buffer[:pending])
+        self._buffer = self._buffer[pending:]
+
+    def finish(self):
+        """串流結束，輸出剩餘的緩衝內容"""
+        self._append(self._buffer)
+        self._buffer = ''
+
+    def format_markdown(self, references_title='參考文獻'):
+        """將目前已解析的內容組成可顯示的 Markdown"""
+        references_name = REFERENCES_MARKER.strip('=')
+        body = '\n\n'.join(
+            text.strip() for name, text in self.sections.items()
+            if name != references_name and text.strip()
+        )
+        references = self.sections.get(references_name, '').strip()
+        if references:
+            body += f"\n\n---\n\n**{references_title}**\n\n{references}"
+        return body
+
+
+def render_stream(chunks, container, refresh_interval=0.15):
+    """將串流片段即時渲染到 Streamlit 容器，回傳完整的回應文字"""
+    parser = SectionStreamParser()
+    parts = []
+    last_render = 0.0
+    for chunk in chunks:
+        parts.append(chunk)
+        parser.feed(chunk)
+        now = time.perf_counter()
+        if now - last_render >= refresh_interval:
+            container.markdown(parser.format_markdown() + ' ▌')
+            last_render = now
+    parser.finish()
+    container.markdown(parser.format_markdown())
+    return ''.join(parts)
+
+
+def complete_chat_streamed(client, stream_container=None, **params):
+    """有提供 Streamlit 容器時以串流方式生成並即時渲染，否則一次取得完整回應"""
+    if stream_container is None:
+        return complete_chat(client, **params)
+    return render_stream(stream_chat(client, **params), stream_container)
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import zlib
+
+import streamlit as st
+
+from session_store import get_default_store, get_session_token
+
+# session state 快照：將頁面的結果（關鍵字、研究目的、文獻、文獻探討等）壓縮後存入 SQLite，
+# 伺服器或容器重新啟動後依 session token 還原，不必重新呼叫模型。
+# 快照依鍵路徑切成小區塊，列表每 SESSION_SNAPSHOT_BLOCK_SIZE 項一個區塊；每次執行只寫入有變更的區塊，
+# 新增文獻時只需重寫最後一個區塊，快照的耗時與寫入量不會隨 session 變大而增加。
+
+SESSION_SNAPSHOT_ENABLED = os.getenv('SESSION_SNAPSHOT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+SESSION_SNAPSHOT_BLOCK_SIZE = int(os.getenv('SESSION_SNAPSHOT_BLOCK_SIZE', '16'))
+SNAPSHOT_COMPRESSION_LEVEL = 6
+
+# 各頁面需要保存的 session state 鍵；_collected_jobs 依工作類型記錄已套用的背景工作，還原後不會重複套用
+COMMON_SNAPSHOT_KEYS = ('_collected_jobs',)
+
+
+def _encode_extra(value):
+    if isinstance(value, (set, frozenset)):
+        return {'__set__': sorted(value)}
+    raise TypeError(f"無法保存 {type(value).__name__} 型別的值")
+
+
+def _decode_extra(value):
+    if len(value) == 1 and '__set__' in value:
+        return set(value['__set__'])
+    return value
+
+
+def encode_chunk(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_encode_extra).encode('utf-8')
+
+
+def decode_chunk(data):
+    return json.loads(data, object_hook=_decode_extra)
+
+
+def flatten_state(value, path, block_size):
+    """將值拆成區塊，產生 (鍵路徑, 區塊內容, 指紋)
+
+    字典依鍵展開；非空列表每 block_size 項一個區塊（路徑最後一項為區塊編號）。
+    指紋保留區塊中各項目的參照，項目未被取代時視為未變更，不必重新序列化；
+    因此列表中的項目（例如文獻 dict）視為不可變，需要修改時請以新的物件取代。
+    """
+    if isinstance(value, dict) and value and all(isinstance(key, str) for key in value):
+        for key, child in value.items():
+            yield from flatten_state(child, path + (key,), block_size)
+    elif isinstance(value, list) and value:
+        for start in range(0, len(value), block_size):
+            block = value[start:start + block_size]
+            yield path + (start // block_size,), block, ('refs', tuple(block))
+    elif isinstance(value, (set, frozenset)):
+        yield path, value, ('value', frozenset(value))
+    else:
+        yield path, value, ('refs', (value,))
+
+
+def _same_fingerprint(previous, current):
+    if previous is None or previous[0] != current[0]:
+        return False
+    if current[0] == 'value':
+        return previous[1] == current[1]
+    return len(previous[1]) == len(current[1]) and all(a is b for a, b in zip(previous[1], current[1]))
+
+
+def rebuild_state(chunks):
+    """由 [(鍵路徑, 區塊內容)] 重建字典；區塊編號為整數的節點依編號串接成列表"""
+    root = {}
+    for path, value in chunks:
+        node = root
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+
+    def finalize(node):
+        if not isinstance(node, dict) or not node:
+            return node
+        if all(isinstance(key, int) for key in node):
+            return [item for index in sorted(node) for item in node[index]]
+        return {key: finalize(child) for key, child in node.items()}
+
+    return {key: finalize(value) for key, value in root.items()}
+
+
+class SnapshotTracker:
+    """記錄各區塊上次保存時的指紋與內容摘要，找出需要寫入與刪除的區塊"""
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size or SESSION_SNAPSHOT_BLOCK_SIZE
+        self._chunks = {}
+
+    def restore(self, rows):
+        """解壓縮 read_snapshot 取得的區塊並重建 session state，同時記錄各區塊的摘要（還原後不會重新寫入）"""
+        chunks = []
+        for path, data in rows:
+            raw = zlib.decompress(data)
+            path = tuple(json.loads(path))
+            self._chunks[path] = (None, hashlib.blake2b(raw, digest_size=16).digest())
+            chunks.append((path, decode_chunk(raw)))
+        return rebuild_state(chunks)
+
+    def diff(self, state, keys=None):
+        """比較 state 與上次保存的內容，回傳 (有變更的區塊, 已刪除的區塊, 新的區塊記錄)
+
+        keys 為這次保存的鍵（預設為 state 的所有鍵），不在 state 中的鍵視為已刪除；
+        有變更的區塊為 [(路徑 JSON, 壓縮後的內容)]，寫入成功後再以 commit 更新記錄。
+        """
+        keys = set(state if keys is None else keys)
+        changed = []
+        current = {}
+        for path, value, fingerprint in self._flatten(state):
+            previous = self._chunks.get(path)
+            if previous is not None and _same_fingerprint(previous[0], fingerprint):
+                current[path] = previous
+                continue
+            raw = encode_chunk(value)
+            digest = hashlib.blake2b(raw, digest_size=16).digest()
+            if previous is None or previous[1] != digest:
+                changed.append((json.dumps(path, ensure_ascii=False), zlib.compress(raw, SNAPSHOT_COMPRESSION_LEVEL)))
+            current[path] = (fingerprint, digest)
+        removed = [
+            json.dumps(path, ensure_ascii=False)
+            for path in self._chunks if path[0] in keys and path not in current
+        ]
+        # 其他頁面保存的鍵不在這次比較的範圍內，保留原本的記錄
+        records = {path: record for path, record in self._chunks.items() if path[0] not in keys}
+        records.update(current)
+        return changed, removed, records
+
+    def commit(self, records):
+        self._chunks = records
+
+    def _flatten(self, state):
+        for key, value in state.items():
+            yield from flatten_state(value, (key,), self.block_size)
+
+
+def restore_session_state():
+    """瀏覽階段第一次執行時（例如伺服器重新啟動或重新整理頁面後），依 session token 還原先前保存的快照
+
+    須在初始化 session state 的預設值之前呼叫；已存在的鍵不會被覆寫。
+    """
+    if not SESSION_SNAPSHOT_ENABLED or '_snapshot_tracker' in st.session_state:
+        return
+    tracker = SnapshotTracker()
+    state = tracker.restore(get_default_store().read_snapshot(get_session_token()))
+    for key, value in state.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+    st.session_state._snapshot_tracker = tracker
+
+
+def save_session_state(keys):
+    """在頁面執行結束時呼叫：保存指定的 session state 鍵，只寫入有變更的區塊"""
+    tracker = st.session_state.get('_snapshot_tracker')
+    if tracker is None:
+        return
+    keys = tuple(keys) + COMMON_SNAPSHOT_KEYS
+    changed, removed, records = tracker.diff(
+        {key: st.session_state[key] for key in keys if key in st.session_state}, keys
+    )
+    if changed or removed:
+        get_default_store().write_snapshot(get_session_token(), changed, removed)
+    tracker.commit(records)
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+# 網址參數中的 session token 名稱
+SESSION_QUERY_PARAM = 'sid'
+SESSION_TOKEN_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_MISSING = object()
+
+
+class SessionStore:
+    """以 session token 為鍵的 SQLite 儲存，用於在頁面之間傳遞結果"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_values (
+                session_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (session_id, name)
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_session_values_updated ON session_values (updated_at)')
+        # session state 快照：每個區塊一列（path 為 JSON 編碼的鍵路徑，data 為壓縮後的內容），依 rowid 保留寫入順序
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_snapshots (
+                session_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                data BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (session_id, path)
+            )
+        """)
+        self.purge_expired()
+
+    def get(self, session_id, name, default=None):
+        """讀取 session 中的值，不存在時回傳 default"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM session_values WHERE session_id = ? AND name = ?', (session_id, name)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, session_id, name, value):
+        """寫入 session 中的值"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO session_values (session_id, name, value, updated_at) VALUES (?, ?, ?, ?)',
+                (session_id, name, json.dumps(value, ensure_ascii=False), time.time())
+            )
+
+    def write_snapshot(self, session_id, chunks, removed=()):
+        """在同一個交易中寫入有變更的快照區塊並刪除已不存在的區塊；chunks 為 [(path, data)]
+
+        已存在的區塊就地更新，保留原本的順序。
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT INTO session_snapshots (session_id, path, data, updated_at) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (session_id, path) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at',
+                    [(session_id, path, data, now) for path, data in chunks]
+                )
+                self._conn.executemany(
+                    'DELETE FROM session_snapshots WHERE session_id = ? AND path = ?',
+                    [(session_id, path) for path in removed]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def read_snapshot(self, session_id):
+        """依寫入順序讀取 session 的所有快照區塊，回傳 [(path, data)]"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT path, data FROM session_snapshots WHERE session_id = ? ORDER BY rowid', (session_id,)
+            ).fetchall()
+
+    def purge_expired(self):
+        """刪除超過保存期限的資料"""
+        if self.ttl is None:
+            return
+        with self._lock:
+            self._conn.execute('DELETE FROM session_values WHERE updated_at < ?', (time.time() - self.ttl,))
+            # 以 session 最後一次寫入的時間判斷，未變更的區塊不會在 session 仍在使用時被刪除
+            self._conn.execute(
+                'DELETE FROM session_snapshots WHERE session_id IN ('
+                'SELECT session_id FROM session_snapshots GROUP BY session_id HAVING MAX(updated_at) < ?)',
+                (time.time() - self.ttl,)
+            )
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """取得程序共用的 session 儲存（依環境變數設定）"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                ttl_days = float(os.getenv('SESSION_STORE_TTL_DAYS', '7'))
+                _default_store = SessionStore(
+                    os.getenv('SESSION_STORE_PATH', os.path.join('.cache', 'session_store.sqlite3')),
+                    ttl=ttl_days * 24 * 3600 if ttl_days > 0 else None
+                )
+    return _default_store
+
+
+def get_session_token():
+    """取得此瀏覽器 session 的 token；存放在網址參數中，重新整理頁面後仍可沿用"""
+    token = st.session_state.get('_session_token')
+    if token is None:
+        token = st.query_params.get(SESSION_QUERY_PARAM)
+        if not token or not SESSION_TOKEN_PATTERN.match(token):
+            token = uuid.uuid4().hex
+            st.query_params[SESSION_QUERY_PARAM] = token
+        st.session_state._session_token = token
+    return token
+
+
+def save_session_value(name, value):
+    """將值寫入此 session 的儲存區；與目前記憶體中的值相同時不寫入"""
+    values = st.session_state.setdefault('_session_store_values', {})
+    if values.get(name, _MISSING) == value:
+        return
+    get_default_store().set(get_session_token(), name, value)
+    values[name] = value
+
+
+def load_session_value(name, default=None):
+    """讀取此 session 的值；只有第一次讀取 SQLite，之後的 rerun 直接由記憶體取得"""
+    values = st.session_state.setdefault('_session_store_values', {})
+    if name not in values:
+        values[name] = get_default_store().get(get_session_token(), name, default)
+    return values[name]
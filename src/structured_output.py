@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+
+from json_stream import repair_truncated_json
+from prompt_templates import REPAIR_NOTE
+
+# 結構化輸出的驗證與部分修補：依簡易結構定義檢查模型回傳的每個 JSON 項目，
+# 只把無效或缺少的項目重新請求，不必因為一個項目有問題就重新產生整份回應。
+
+# 無效項目最多重新請求的次數
+STRUCTURED_REPAIR_ROUNDS = int(os.getenv('STRUCTURED_REPAIR_ROUNDS', '1'))
+
+
+class ItemSchema:
+    """JSON 物件的簡易結構定義：必要欄位與型別，以及列表欄位中每個元素的結構"""
+
+    def __init__(self, fields, items=None):
+        self.fields = fields
+        self.items = items or {}
+
+    def problems(self, item):
+        """回傳項目不符合結構的問題列表，符合時回傳空列表"""
+        if item is None:
+            return ['沒有回覆']
+        if not isinstance(item, dict):
+            return ['不是 JSON 物件']
+        problems = []
+        for name, kind in self.fields.items():
+            value = item.get(name)
+            if value is None or value == '' or value == []:
+                problems.append(f'缺少 {name}')
+            elif not isinstance(value, kind):
+                problems.append(f'{name} 的格式不正確')
+            elif name in self.items:
+                for number, child in enumerate(value, start=1):
+                    problems.extend(f'{name} 第 {number} 筆{problem}' for problem in self.items[name].problems(child))
+        return problems
+
+
+class ListSchema:
+    """一個輸入對應多個項目時使用（例如一段貼上的文字包含多篇文獻），每個項目都需符合 schema"""
+
+    def __init__(self, schema):
+        self.schema = schema
+
+    def problems(self, items):
+        if not items:
+            return ['沒有回覆']
+        if len(items) == 1:
+            return self.schema.problems(items[0])
+        return [
+            f'第 {number} 項{problem}'
+            for number, item in enumerate(items, start=1)
+            for problem in self.schema.problems(item)
+        ]
+
+
+SECTION_SCHEMA = ItemSchema(
+    {'title_zh': str, 'description': str, 'search_queries': list},
+    items={'search_queries': ItemSchema({'focus': str, 'query': str})}
+)
+LITERATURE_SCHEMA = ItemSchema({
+    'citation': str, 'abstract': str, 'relevance': str, 'contribution': str, 'usage_suggestion': str
+})
+ASSESSMENT_SCHEMA = ItemSchema({'relevance': str, 'contribution': str, 'usage_suggestion': str})
+
+
+def parse_json_items(content, array_key):
+    """由模型回應取出 array_key 陣列；前後有多餘文字或被截斷時保留可解析的部分，完全無法解析時回傳 None"""
+    try:
+        result = json.loads(content.strip())
+    except json.JSONDecodeError:
+        result = repair_truncated_json(content)
+    if not isinstance(result, dict) or not isinstance(result.get(array_key), list):
+        return None
+    return result[array_key]
+
+
+def _item_number(item):
+    if isinstance(item, dict) and str(item.get('index', '')).strip().isdigit():
+        return int(str(item['index']).strip())
+    return None
+
+
+def group_items_by_index(items, count):
+    """依 index 欄位（從 1 開始）將項目分組，回傳長度為 count 的列表；沒有 index 時依順序對應"""
+    groups = [[] for _ in range(count)]
+    numbers = [_item_number(item) for item in items]
+    if items and all(number is not None for number in numbers):
+        for number, item in zip(numbers, items):
+            if 1 <= number <= count:
+                groups[number - 1].append(item)
+    elif count == 1:
+        groups[0] = list(items)
+    else:
+        for position, item in enumerate(items[:count]):
+            groups[position].append(item)
+    return groups
+
+
+def format_problems(problems):
+    """將各項目的問題整理成修補提示中的說明（編號從 1 開始，對應重新送出的項目）"""
+    return '\n'.join(
+        f"第 {number} 筆：{'、'.join(item_problems)}"
+        for number, item_problems in enumerate(problems, start=1)
+    )
+
+
+def with_repair_note(messages, problems):
+    """在原本的訊息之後附加簡短的修補說明（固定的提示詞開頭不變，仍可命中服務端快取）"""
+    if not problems:
+        return messages
+    return messages + [{'role': 'user', 'content': REPAIR_NOTE.format(problems=format_problems(problems))}]
+
+
+class RepairStats:
+    """記錄各步驟的結構化輸出驗證結果：檢查項目數、無效項目數、修補請求次數、修補成功與失敗的項目數"""
+
+    FIELDS = ('items', 'invalid', 'repair_calls', 'repaired', 'failed')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps = {}
+
+    def record(self, step, **counts):
+        with self._lock:
+            stats = self._steps.setdefault(step or 'unknown', dict.fromkeys(self.FIELDS, 0))
+            for name, value in counts.items():
+                stats[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {step: dict(stats) for step, stats in self._steps.items()}
+
+    def totals(self):
+        totals = dict.fromkeys(self.FIELDS, 0)
+        for stats in self.snapshot().values():
+            for name in self.FIELDS:
+                totals[name] += stats[name]
+        return totals
+
+
+# 程序層級的修補統計
+REPAIR_STATS = RepairStats()
+
+
+def validate_and_repair(results, schema, repair, step, max_rounds=None):
+    """驗證每個輸入的結果，只將無效或缺少的結果交給 repair 重新請求
+
+    results 為依輸入順序排列的結果（缺少時為 None）；repair(positions, problems) 回傳依序對應 positions 的新結果，
+    problems 為各結果的問題列表。回傳修補後的結果列表，修補後仍無效者為 None。
+    """
+    max_rounds = STRUCTURED_REPAIR_ROUNDS if max_rounds is None else max_rounds
+    results = list(results)
+    problems = [schema.problems(result) for result in results]
+    invalid = sum(1 for item_problems in problems if item_problems)
+    REPAIR_STATS.record(step, items=len(results), invalid=invalid)
+
+    for _ in range(max_rounds):
+        positions = [position for position, item_problems in enumerate(problems) if item_problems]
+        if not positions:
+            break
+        REPAIR_STATS.record(step, repair_calls=1)
+        try:
+            repaired = repair(positions, [problems[position] for position in positions])
+        except Exception:
+            # 修補請求失敗時保留已有效的結果
+            break
+        for position, result in zip(positions, repaired):
+            results[position] = result
+            problems[position] = schema.problems(result)
+
+    failed = sum(1 for item_problems in problems if item_problems)
+    REPAIR_STATS.record(step, repaired=invalid - failed, failed=failed)
+    return [None if item_problems else result for result, item_problems in zip(results, problems)]
+
+
+def render_repair_stats(container, stats=None):
+    """在側邊欄等容器中顯示結構化輸出的修補統計"""
+    stats = stats or REPAIR_STATS
+    totals = stats.totals()
+    if not totals['items']:
+        return
+    expander = container.expander("🧩 結構化輸出修補", expanded=False)
+    rate = totals['invalid'] / totals['items']
+    expander.caption(
+        f"檢查 {totals['items']} 項，無效 {totals['invalid']} 項（{rate:.1%}），"
+        f"修補請求 {totals['repair_calls']} 次，修補成功 {totals['repaired']} 項，仍失敗 {totals['failed']} 項"
+    )
+    for step, step_stats in stats.snapshot().items():
+        expander.caption(
+            f"`{step}`：無效 {step_stats['invalid']} / {step_stats['items']} 項，"
+            f"修補 {step_stats['repair_calls']} 次，失敗 {step_stats['failed']} 項"
+        )
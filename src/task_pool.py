@@ -0,0 +1,20 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def map_concurrently(func, items, max_workers=4):
+    """以執行緒池並行執行 func(item)，依完成順序產生 (索引, 結果, 例外)；單一項目失敗不影響其他項目
+
+    每個工作都在呼叫端 context 的複本中執行，讓 session 綁定的狀態（例如 token 用量帳本）延續到工作執行緒。
+    """
+    items = list(items)
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = {executor.submit(contextvars.copy_context().run, func, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                yield index, None, e
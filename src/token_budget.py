@@ -0,0 +1,191 @@
+import contextvars
+import os
+import re
+import threading
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # 未安裝 tiktoken 時改用字元數估算
+    tiktoken = None
+
+# 各模型的上下文長度（tokens）
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-4o-mini': 128000,
+    'gpt-4o': 128000,
+    'gpt-4': 8192,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.getenv('LLM_DEFAULT_CONTEXT_WINDOW', '16385'))
+
+# 未指定 max_tokens 時為輸出保留的 token 數
+DEFAULT_OUTPUT_RESERVE = int(os.getenv('LLM_OUTPUT_RESERVE_TOKENS', '1024'))
+
+# 每則訊息與整體回覆的格式額外開銷（依 OpenAI 的計算方式）
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+TRUNCATION_NOTICE = '\n…（內容過長，已截斷）…\n'
+
+CJK_PATTERN = re.compile(r'[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+class TokenBudgetError(ValueError):
+    """提示詞超過模型上下文限制且無法裁切時拋出"""
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        # 無法下載編碼檔（例如離線環境）時退回估算
+        return None
+
+
+def count_tokens(text, model='gpt-3.5-turbo'):
+    """計算文字的 token 數；無 tiktoken 時以中日韓文字每字 1 token、其餘每 4 個字元 1 token 估算"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk_count = len(CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count) // 4 + 1
+
+
+def count_message_tokens(messages, model='gpt-3.5-turbo'):
+    """計算 chat 訊息列表的 token 數"""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message.get('content') or '', model)
+    return total
+
+
+def get_context_window(model):
+    """取得模型的上下文長度"""
+    for name, window in MODEL_CONTEXT_WINDOWS.items():
+        if model == name or (model or '').startswith(name + '-'):
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def truncate_to_tokens(text, max_tokens, model='gpt-3.5-turbo', head_ratio=0.7, notice=TRUNCATION_NOTICE):
+    """將文字裁切到指定 token 數內，保留開頭與結尾並在中間加上截斷提示（head_ratio 為 1 時只保留開頭）"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    budget = max(max_tokens - count_tokens(notice, model), 0)
+    # 以字元比例逼近，再逐步縮小直到符合預算
+    keep = int(len(text) * budget / max(count_tokens(text, model), 1))
+    while keep > 0:
+        head = int(keep * head_ratio)
+        tail = keep - head
+        candidate = text[:head] + notice + (text[-tail:] if tail else '')
+        if count_tokens(candidate, model) <= max_tokens:
+            return candidate
+        keep = int(keep * 0.9)
+    return notice.strip()
+
+
+def fit_messages_to_budget(messages, model, max_output_tokens=None):
+    """確認提示詞加上輸出保留量不超過模型上下文
+
+    超過時裁切最長的使用者訊息；系統訊息本身就超過限制時拋出 TokenBudgetError。
+    回傳 (訊息列表, 提示詞 token 數, 是否經過裁切)。
+    """
+    window = get_context_window(model)
+    reserve = max_output_tokens or DEFAULT_OUTPUT_RESERVE
+    limit = window - reserve
+    prompt_tokens = count_message_tokens(messages, model)
+    if prompt_tokens <= limit:
+        return messages, prompt_tokens, False
+
+    user_indexes = [i for i, message in enumerate(messages) if message.get('role') == 'user']
+    if not user_indexes:
+        raise TokenBudgetError(f"提示詞約 {prompt_tokens} tokens，超過模型 {model} 可用的 {limit} tokens")
+    target = max(user_indexes, key=lambda i: len(messages[i].get('content') or ''))
+    content = messages[target].get('content') or ''
+    allowed = count_tokens(content, model) - (prompt_tokens - limit)
+    if allowed < 200:
+        raise TokenBudgetError(
+            f"提示詞約 {prompt_tokens} tokens，超過模型 {model} 可用的 {limit} tokens，請減少輸入內容"
+        )
+    trimmed = list(messages)
+    trimmed[target] = dict(messages[target], content=truncate_to_tokens(content, allowed, model, head_ratio=0.5))
+    return trimmed, count_message_tokens(trimmed, model), True
+
+
+class TokenUsage:
+    """記錄 token 用量的帳本，依步驟累計呼叫次數、輸入與輸出 token 數"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps = {}
+
+    def record(self, step, prompt_tokens=0, completion_tokens=0, cached=False, trimmed=False, rejected=False):
+        with self._lock:
+            stats = self.steps.setdefault(step or 'other', {
+                'calls': 0, 'cached_calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'trimmed': 0, 'rejected': 0
+            })
+            if rejected:
+                stats['rejected'] += 1
+                return
+            stats['calls'] += 1
+            stats['trimmed'] += int(trimmed)
+            if cached:
+                # 由快取回傳，不計入實際計費的 token
+                stats['cached_calls'] += 1
+                return
+            stats['prompt_tokens'] += prompt_tokens
+            stats['completion_tokens'] += completion_tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {step: dict(stats) for step, stats in self.steps.items()}
+
+    def totals(self):
+        totals = {'calls': 0, 'cached_calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'trimmed': 0, 'rejected': 0}
+        for stats in self.snapshot().values():
+            for name in totals:
+                totals[name] += stats[name]
+        return totals
+
+
+# 整個程序的用量，以及目前 session 綁定的用量帳本
+PROCESS_USAGE = TokenUsage()
+_session_usage = contextvars.ContextVar('session_token_usage', default=None)
+
+
+def bind_session_usage(usage):
+    """將目前執行環境（含其後建立的工作執行緒）的 token 用量記錄到指定帳本"""
+    _session_usage.set(usage)
+
+
+def record_usage(step, **kwargs):
+    """同時記錄到程序帳本與目前 session 的帳本"""
+    PROCESS_USAGE.record(step, **kwargs)
+    usage = _session_usage.get()
+    if usage is not None:
+        usage.record(step, **kwargs)
+
+
+def render_token_usage(container, usage):
+    """在側邊欄等容器中顯示 session 的 token 用量"""
+    totals = usage.totals()
+    expander = container.expander("🔢 Token 用量", expanded=False)
+    col1, col2 = expander.columns(2)
+    col1.metric("輸入 tokens", f"{totals['prompt_tokens']:,}")
+    col2.metric("輸出 tokens", f"{totals['completion_tokens']:,}")
+    expander.caption(
+        f"呼叫 {totals['calls']} 次（快取 {totals['cached_calls']} 次），"
+        f"裁切 {totals['trimmed']} 次，拒絕 {totals['rejected']} 次"
+    )
+    for step, stats in usage.snapshot().items():
+        expander.caption(
+            f"`{step}`：{stats['calls']} 次，輸入 {stats['prompt_tokens']:,} / 輸出 {stats['completion_tokens']:,}"
+        )
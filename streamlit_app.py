@@ -6,9 +6,8 @@ import os
 src_path = os.path.join(os.path.dirname(__file__), 'src')
 sys.path.append(src_path)
 
-# 導入應用程式
-from app import main as app_main
-from literature_analysis import main as literature_main
+# 程序啟動時載入一次 .env（須在匯入頁面模組之前）
+import environment  # noqa: E402,F401
 
 # 設定頁面配置
 st.set_page_config(
@@ -24,7 +23,11 @@ page = st.sidebar.radio(
     ["研究目的生成", "文獻分析工具"]
 )
 
+# 只匯入目前選擇的頁面，另一個頁面在第一次切換時才載入；
+# 已匯入的模組留在 sys.modules，之後的重新執行與切換頁面不會重新載入
 if page == "研究目的生成":
+    from app import main as app_main
     app_main()
 else:
-    literature_main() 
\ No newline at end of file
+    from literature_analysis import main as literature_main
+    literature_main()
@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from context_packer import CONTEXT_MIN_ABSTRACT_TOKENS, pack_literature, pack_literature_groups
+from token_budget import count_tokens
+
+
+def _paper(number, words=40):
+    return {
+        'citation': f'Author{number}, A. (2020). Title number {number}. Journal, 1, 1-10.',
+        'abstract': ' '.join(f'abstract{number} word{index}' for index in range(words)),
+        'contribution': f'貢獻 {number}',
+        'relevance': f'相關性說明 {number}',
+    }
+
+
+def test_fits_without_changes():
+    papers = [_paper(1), _paper(2), dict(_paper(1))]
+    packed = pack_literature(papers, 10000)
+    assert packed.report['duplicates'] == 1
+    assert packed.report['included'] == 2
+    assert packed.included == papers[:2]
+    assert '相關性：相關性說明 1' in packed.text
+    assert packed.report['packed_tokens'] == count_tokens(packed.text) < packed.report['json_tokens']
+
+
+def test_budget_omits_optional_fields_then_trims_abstracts():
+    papers = [_paper(number, words=200) for number in range(3)]
+    budget = 3 * (CONTEXT_MIN_ABSTRACT_TOKENS + 60)
+    packed = pack_literature(papers, budget)
+    assert packed.report['packed_tokens'] <= budget
+    assert packed.report['omitted_fields'] == ['relevance']
+    assert packed.report['trimmed'] == 3
+    assert packed.report['dropped'] == 0
+    assert '相關性' not in packed.text
+    assert packed.text.count('…') == 3
+
+
+def test_drops_lowest_priority_from_largest_group():
+    groups = [('甲', [_paper(number, words=200) for number in range(4)]), ('乙', [_paper(9, words=200)])]
+    packed = pack_literature_groups(groups, 2 * (CONTEXT_MIN_ABSTRACT_TOKENS + 60))
+    assert packed.report['packed_tokens'] <= packed.report['budget']
+    assert packed.report['dropped'] >= 1
+    # 章節乙只有一篇，先略過章節甲末尾的文獻
+    assert groups[1][1][0] in packed.included
+    assert packed.included[0] is groups[0][1][0]
+    assert '【乙】' in packed.text
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from json_stream import JsonArrayStreamParser, repair_truncated_json
+
+RESPONSE = '說明文字\n```json\n{"sections": [{"title_zh": "甲", "note": "含 } 與 \\" 的字串"}, {"title_zh": "乙"}], "extra": [{"x": 1}]}\n```'
+
+
+def test_repair_drops_incomplete_value():
+    assert repair_truncated_json('{"sections": [{"a": 1}, {"b": "未完') == {'sections': [{'a': 1}, {}]}
+    assert repair_truncated_json('{"sections": [{"a": 1}, {"b": 2}') == {'sections': [{'a': 1}, {'b': 2}]}
+    assert repair_truncated_json('{"sections": [{"a": 1}], "note": "未') == {'sections': [{'a': 1}]}
+
+
+def test_repair_ignores_surrounding_text():
+    assert repair_truncated_json('以下是結果：{"a": [1, 2]} 以上') == {'a': [1, 2]}
+    assert repair_truncated_json('沒有 JSON') is None
+
+
+def test_stream_parser_emits_items_as_they_close():
+    parser = JsonArrayStreamParser('sections')
+    emitted = [item for index in range(0, len(RESPONSE), 7) for item in parser.feed(RESPONSE[index:index + 7])]
+    # 只取出 sections 陣列中的元素，字串中的括號與跳脫引號不影響解析
+    assert emitted == [{'title_zh': '甲', 'note': '含 } 與 " 的字串'}, {'title_zh': '乙'}]
+    assert parser.items == emitted
+    assert parser.text.startswith('{"sections"')
@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from literature_parser import parse_citation, parse_literature_entry
+
+EN_ENTRY = """Design thinking in practice
+Brown, T., & Martin, R. L. (2015). Design for action. Harvard Business Review, 93(9), 56-64. https://doi.org/10.1234/hbr.2015.09.
+Abstract: Design thinking helps organizations turn ideas into strategies that people will adopt."""
+
+ZH_ENTRY = """王小明、李大華（2020）。設計思考於互動設計之應用。設計學報，25（2），1-20。
+摘要：本研究探討設計思考在互動設計課程中的應用方式與學習成效。
+doi:10.5678/jd.2020.25"""
+
+
+def test_parse_english_entry():
+    entry = parse_literature_entry(EN_ENTRY)
+    assert entry['authors'] == ['Brown, T.', 'Martin, R. L.']
+    assert entry['year'] == '2015'
+    assert entry['title'] == 'Design for action'
+    assert entry['doi'] == '10.1234/hbr.2015.09'
+    # SciSpace 的標題列不算引用格式，摘要標籤會被移除
+    assert entry['citation'].startswith('Brown, T.')
+    assert entry['abstract'].startswith('Design thinking helps')
+
+
+def test_parse_chinese_entry():
+    entry = parse_literature_entry(ZH_ENTRY)
+    assert entry['authors'] == ['王小明', '李大華']
+    assert entry['year'] == '2020'
+    assert entry['title'] == '設計思考於互動設計之應用'
+    # DOI 單獨一行時不算摘要
+    assert entry['doi'] == '10.5678/jd.2020.25'
+    assert entry['abstract'] == '本研究探討設計思考在互動設計課程中的應用方式與學習成效。'
+
+
+def test_uncertain_entries_left_to_model():
+    assert parse_literature_entry('Brown, T. (2009). Change by design.') is None
+    assert parse_literature_entry('這是一段沒有引用格式的筆記\n只有內文沒有作者與年份的資訊') is None
+    assert parse_literature_entry('王小明（2020）。設計思考。設計學報。\n太短') is None
+
+
+def test_parse_citation_without_match_keeps_doi():
+    assert parse_citation('見 https://doi.org/10.1111/abc.123') == {
+        'authors': [], 'year': '', 'title': '', 'doi': '10.1111/abc.123'
+    }
+    assert parse_citation('陳美玲等（2019）。使用者經驗研究。設計研究，3，1-9。')['authors'] == ['陳美玲']
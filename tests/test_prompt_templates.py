@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from prompt_templates import PROMPTS, PROVIDER_CACHE_MIN_TOKENS, TAIWAN_STYLE_GUIDE, render_prompt
+from token_budget import count_tokens
+
+# 改用樣板登錄表之前，文獻分析每次批次呼叫的系統訊息
+BASELINE_ANALYSIS_SYSTEM = """您是一位專業的文獻分析專家，請協助分析輸入的多篇文獻內容。
+請使用台灣繁體中文的用字習慣撰寫分析內容，注意：
+- 使用台灣的學術用語和專業術語
+- 使用台灣的標點符號習慣（如：使用「」引號）
+- 使用台灣的語氣詞和表達方式
+- 避免使用中國大陸的用語習慣
+從輸入的文字中識別出每篇文獻的 APA 引用格式和摘要內容，並進行分析整理。
+每篇文獻之間應該是用連續兩個換行符號分隔。"""
+
+# 每批文獻都會呼叫一次的樣板與其變數
+BATCH_TEMPLATES = {
+    'literature_analysis': {'section_title': '設計思考', 'literature_texts': '文獻'},
+    'literature_assessment': {'section_title': '設計思考', 'literature_list': '文獻'},
+    'structure_repair': {'research_purpose': '研究目的', 'sections': '章節'},
+}
+
+
+def test_style_guide_only_on_cacheable_templates():
+    for name, template in PROMPTS.items():
+        if TAIWAN_STYLE_GUIDE in (template.shared_prefix, template.system):
+            assert template.size()['static_tokens'] >= PROVIDER_CACHE_MIN_TOKENS, name
+
+
+def test_batch_system_prompts_not_grown():
+    baseline = count_tokens(BASELINE_ANALYSIS_SYSTEM)
+    for name, values in BATCH_TEMPLATES.items():
+        system = render_prompt(name, **values)[0]['content']
+        assert TAIWAN_STYLE_GUIDE not in system, name
+        assert count_tokens(system) <= baseline, name
+
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from relevance_ranker import bm25_scores, rank_papers, select_top_papers
+
+SECTION = {'title_zh': '設計思考', 'description': '設計思考在互動設計教育中的應用', 'search_queries': [{'query': 'design thinking'}]}
+PAPERS = [
+    {'citation': 'Lee, A. (2018). Supply chain logistics.', 'abstract': '探討物流與供應鏈的庫存管理。'},
+    {'citation': 'Brown, T. (2009). Change by design.', 'abstract': '以設計思考推動互動設計教育的課程改革。'},
+    {'citation': 'Chen, B. (2020). Thinking about design education.', 'abstract': 'Design thinking in studio courses.'},
+]
+
+
+def test_cjk_bigrams_match_only_adjacent_characters():
+    # 「設計」「計思」「思考」都是查詢中的 bigram；「設 計」中間有空白不組成 bigram
+    scores = bm25_scores('設計思考', ['設計思考', '設 計 思 考', '思考設計'])
+    assert scores[0] > scores[2] > scores[1] == 0
+
+
+def test_fullwidth_and_case_normalized():
+    scores = bm25_scores('Design Thinking', ['ＤＥＳＩＧＮ ＴＨＩＮＫＩＮＧ', 'the of and'])
+    assert scores[0] > 0 and scores[1] == 0
+
+
+def test_rank_papers_by_section_relevance():
+    order, scores = rank_papers(SECTION, PAPERS)
+    assert list(order)[-1] == 0
+    assert scores[0] == 0
+    assert select_top_papers(SECTION, PAPERS, 2) == [PAPERS[index] for index in order[:2]]
+    assert select_top_papers(SECTION, PAPERS, 0) == [PAPERS[index] for index in order]
+    assert select_top_papers(SECTION, [], 3) == []
+
+
+def test_ties_keep_original_order():
+    papers = [{'citation': '無關文獻甲'}, {'citation': '無關文獻乙'}]
+    order, _ = rank_papers(SECTION, papers)
+    assert list(order) == [0, 1]
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from session_snapshot import SnapshotTracker
+
+
+def _save(tracker, state, keys=None):
+    changed, removed, records = tracker.diff(state, keys)
+    tracker.commit(records)
+    return changed, removed
+
+
+def _state():
+    return {
+        'sections': [{'title_zh': f'章節{index}'} for index in range(5)],
+        'literature_reviews': {'章節0': '文獻探討內容'},
+        'structure_created_at': 1.5,
+        '_collected_jobs': {'review_all': {'b', 'a'}},
+    }
+
+
+def test_round_trip_restores_state():
+    state = _state()
+    changed, _ = _save(SnapshotTracker(block_size=2), state)
+    restored = SnapshotTracker(block_size=2)
+    assert restored.restore(changed) == state
+    # 還原後狀態未變更時不需要重新寫入
+    assert _save(restored, state) == ([], [])
+
+
+def test_only_changed_blocks_written():
+    state = _state()
+    tracker = SnapshotTracker(block_size=2)
+    stored = dict(_save(tracker, state)[0])
+    state['sections'] = state['sections'] + [{'title_zh': '章節5'}]
+    state['_collected_jobs']['review_all'].add('c')
+    changed, removed = _save(tracker, state)
+    assert [json.loads(path) for path, _ in changed] == [['sections', 2], ['_collected_jobs', 'review_all']]
+    assert removed == []
+
+    stored.update(changed)
+    assert SnapshotTracker(block_size=2).restore(list(stored.items())) == state
+
+
+def test_deleted_keys_removed():
+    tracker = SnapshotTracker(block_size=2)
+    _save(tracker, _state())
+    state = _state()
+    del state['literature_reviews']
+    _, removed = _save(tracker, state, keys=list(_state()))
+    assert [json.loads(path) for path in removed] == [['literature_reviews', '章節0']]
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from structured_output import (
+    ASSESSMENT_SCHEMA, SECTION_SCHEMA, RepairStats, group_items_by_index, parse_json_items, validate_and_repair
+)
+import structured_output
+
+VALID = {'relevance': '高', 'contribution': '提出架構', 'usage_suggestion': '用於理論基礎'}
+
+
+def test_schema_reports_nested_problems():
+    section = {'title_zh': '甲', 'description': '說明', 'search_queries': [{'focus': '焦點'}]}
+    assert SECTION_SCHEMA.problems(section) == ['search_queries 第 1 筆缺少 query']
+    assert ASSESSMENT_SCHEMA.problems(dict(VALID, relevance=3)) == ['relevance 的格式不正確']
+    assert ASSESSMENT_SCHEMA.problems(None) == ['沒有回覆']
+
+
+def test_repair_requests_only_invalid_items(monkeypatch):
+    monkeypatch.setattr(structured_output, 'REPAIR_STATS', RepairStats())
+    calls = []
+
+    def repair(positions, problems):
+        calls.append((positions, problems))
+        return [VALID for _ in positions]
+
+    results = validate_and_repair([VALID, dict(VALID, contribution=''), None], ASSESSMENT_SCHEMA, repair, 'test', 1)
+    assert results == [VALID, VALID, VALID]
+    assert calls == [([1, 2], [['缺少 contribution'], ['沒有回覆']])]
+    assert structured_output.REPAIR_STATS.totals() == {
+        'items': 3, 'invalid': 2, 'repair_calls': 1, 'repaired': 2, 'failed': 0
+    }
+
+
+def test_repair_failure_keeps_valid_items(monkeypatch):
+    monkeypatch.setattr(structured_output, 'REPAIR_STATS', RepairStats())
+
+    def repair(positions, problems):
+        raise RuntimeError('API 錯誤')
+
+    assert validate_and_repair([VALID, {}], ASSESSMENT_SCHEMA, repair, 'test', 2) == [VALID, None]
+    assert structured_output.REPAIR_STATS.totals()['failed'] == 1
+
+
+def test_items_grouped_by_index():
+    items = parse_json_items('{"assessments": [{"index": 2, "a": 1}, {"index": "1", "a": 2}, {"index": 5}', 'assessments')
+    assert group_items_by_index(items, 2) == [[{'index': '1', 'a': 2}], [{'index': 2, 'a': 1}]]
+    assert parse_json_items('不是 JSON', 'assessments') is None